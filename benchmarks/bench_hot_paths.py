@@ -0,0 +1,204 @@
+"""
+Latency and throughput of the hot paths on synthetic market data, without any network access.
+
+Every run works in a scratch directory: the predictions and price history databases, the data
+directory and the prediction model all live there, so the checkout's own files are never touched.
+Quotes come from FakeBSE sized like the real BSE universe, price history from synthetic_ohlcv, and
+predict_algo runs an untrained model of the production architecture (same cost as a trained one),
+through the NumPy engine and through Keras.
+
+    python -m benchmarks.bench_hot_paths
+    python -m benchmarks.bench_hot_paths --baseline benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.bench_hot_paths --output benchmarks/baseline.json   # refresh the baseline
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.harness import compare, environment, load_results, measure, save_results  # noqa: E402
+from benchmarks.synthetic import synthetic_ohlcv  # noqa: E402
+
+BENCHMARKS = ('create_features', 'preprocess_data', 'predict_algo', 'quotes', 'get_predictions')
+
+
+def prepare_workdir(workdir):
+    """
+    Point the project at workdir. Must run before any project module is imported, because the
+    database paths are read from the environment and the working directory at import time.
+    """
+    for subdir in ('utils', 'model', 'data'):
+        os.makedirs(os.path.join(workdir, subdir), exist_ok=True)
+    os.environ['STOCK_SENSE_DB_PATH'] = os.path.join(workdir, 'utils', 'stock_predictions.db')
+    os.environ['STOCK_SENSE_DATA_DIR'] = os.path.join(workdir, 'data')
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    os.chdir(workdir)
+
+    from create_db import create_db
+    create_db()
+
+
+def bench_create_features(args):
+    from features.FeatureFactory import create_features
+
+    frame = synthetic_ohlcv(bars=args.bars)
+    return {'create_features': measure(lambda: create_features(frame.copy()), args.repeat, items=len(frame))}
+
+
+def bench_preprocess_data(args):
+    from model.training_script import preprocess_data
+
+    data = synthetic_ohlcv(bars=args.bars)[['Open', 'High', 'Low', 'Close', 'Volume']]
+    return {
+        'preprocess_data': measure(lambda: preprocess_data(data), args.repeat, items=len(data)),
+        'preprocess_data_last_only': measure(lambda: preprocess_data(data, last_only=True), args.repeat * 10),
+    }
+
+
+def bench_predict_algo(args):
+    from model.training_script import MODEL_FILE, build_model
+    from utils import ml
+
+    if not os.path.exists(MODEL_FILE):
+        # Weights do not change the inference cost, so skip the (networked) training run
+        build_model((100, 5)).save(MODEL_FILE)
+    stock = synthetic_ohlcv(bars=args.bars)
+    results = {}
+    for backend in ('numpy', 'keras'):
+        ml.INFERENCE_BACKEND = backend
+        name = 'predict_algo' if backend == 'numpy' else f'predict_algo_{backend}'
+        results[name] = measure(lambda: ml.predict_algo(stock, 'SYNTH'), args.repeat, warmup=2)
+    return results
+
+
+def bench_quotes(args):
+    from dataclass_db.dataclass_db_executor import fetch_quotes_batch, insert_stock_quote, insert_stock_quotes
+    from datasource.data_source import FakeBSE
+    from executors.ingestion import QuoteIngestionEngine
+
+    bse = FakeBSE(size=args.universe)
+    codes = list(bse.getScripCodes())
+    quotes = [bse.getQuote(code) for code in codes]
+    single = iter(quotes * (args.repeat * 20 // len(quotes) + 2))
+    engine = QuoteIngestionEngine(bse.getQuote, rate=1e9)
+    offsets = iter(range(0, 10 ** 9, 500))
+
+    results = {
+        'fake_bse_get_quote': measure(lambda: bse.getQuote(codes[0]), args.repeat * 20),
+        'insert_stock_quote': measure(lambda: insert_stock_quote(next(single)), args.repeat * 20),
+        'insert_stock_quotes': measure(lambda: insert_stock_quotes(quotes), max(3, args.repeat // 5),
+                                       items=len(quotes)),
+        'ingest_universe': measure(lambda: engine.run(codes), 3, items=len(codes)),
+    }
+    results['fetch_quotes_batch'] = measure(lambda: fetch_quotes_batch(500, next(offsets) % len(quotes)),
+                                            args.repeat * 5, items=500)
+    return results
+
+
+def _seed_predictions(table, count):
+    from dataclass_db.dataclass_db_executor import upsert_predictions
+
+    rows = []
+    for index in range(count):
+        current = 100.0 + index % 900
+        row = {
+            'company_name': f'Fake Company {index}',
+            'security_id': f'FAKE{index}',
+            'current_price': current,
+            'predicted_price': current * (1 + ((index * 7919) % 2001 - 1000) / 10000),
+            'prediction_date': '2024-01-02',
+        }
+        if table == 'predictions_linear':
+            row['active'] = 1
+        rows.append(row)
+    upsert_predictions(rows, table=table)
+
+
+def bench_get_predictions(args):
+    import linear_predict
+    import main
+    from utils.response_cache import get_response_cache
+
+    cache = get_response_cache()
+    results = {}
+    for service, module, table in (('main', main, 'predictions'), ('linear', linear_predict, 'predictions_linear')):
+        _seed_predictions(table, args.universe)
+        client = module.app.test_client()
+
+        def get(url, **kwargs):
+            response = client.get(url, **kwargs)
+            assert response.status_code in (200, 304), (url, response.status_code)
+            return response
+
+        etag = get('/get_predictions').headers['ETag']
+        results[f'get_predictions_{service}'] = measure(lambda: get('/get_predictions'), args.repeat,
+                                                        items=args.universe)
+        # Cache misses: the listing is read from SQLite and serialized on every call
+        results[f'get_predictions_{service}_uncached'] = measure(
+            lambda: (cache.invalidate(), get('/get_predictions')), args.repeat, items=args.universe)
+        results[f'get_predictions_{service}_page'] = measure(lambda: get('/get_predictions?limit=100'),
+                                                             args.repeat * 5, items=100)
+        results[f'get_predictions_{service}_not_modified'] = measure(
+            lambda: get('/get_predictions', headers={'If-None-Match': etag}), args.repeat * 5)
+    return results
+
+
+def run(args):
+    results = {}
+    for name in args.only or BENCHMARKS:
+        for benchmark, result in globals()[f'bench_{name}'](args).items():
+            results[benchmark] = result
+            print(json.dumps(dict(benchmark=benchmark, **result)), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--universe', type=int, default=5000, help='Scrip codes in the fake BSE universe.')
+    parser.add_argument('--bars', type=int, default=3500, help='Daily bars of synthetic price history.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per benchmark (some scale it up).')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS)
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--baseline', help='Compare against results previously written with --output.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p50 slowdown, as a fraction.')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--keep-workdir', action='store_true')
+    args = parser.parse_args()
+    for path in ('output', 'baseline'):
+        if getattr(args, path):
+            setattr(args, path, os.path.abspath(getattr(args, path)))
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='stock-sense-bench-')
+    try:
+        prepare_workdir(workdir)
+        results = run(args)
+    finally:
+        os.chdir(cwd)
+        if args.keep_workdir:
+            print(f'Work directory kept at {workdir}', file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    meta = dict(environment(), universe=args.universe, bars=args.bars, repeat=args.repeat)
+    if args.output:
+        save_results(args.output, results, meta)
+
+    if args.baseline:
+        rows, regressions = compare(results, load_results(args.baseline)['results'], args.tolerance)
+        for row in rows:
+            print(json.dumps(row))
+        if regressions:
+            print(f"Regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Start-up cost of each service: wall time and peak RSS of importing its module in a fresh
+interpreter, and which heavy libraries the import pulled in.
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --modules linear_predict --repeat 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('tensorflow', 'keras', 'sklearn', 'scipy', 'pandas', 'yfinance')
+
+PROBE = '''
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def probe(module):
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(modules, repeat):
+    results = []
+    for module in modules:
+        samples = [probe(module) for _ in range(repeat)]
+        seconds = [sample['seconds'] for sample in samples]
+        results.append({
+            'module': module,
+            'runs': repeat,
+            'import_p50_s': round(float(np.percentile(seconds, 50)), 3),
+            'import_max_s': round(max(seconds), 3),
+            'max_rss_mb': round(max(sample['max_rss_mb'] for sample in samples), 1),
+            'heavy_modules': samples[-1]['heavy'],
+        })
+        print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', nargs='+', default=['linear_predict', 'linear_predict_scheduler', 'main'])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.modules, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Construction time and memory of a batch of stored quotes in each representation: plain
+dataclasses built from sqlite3.Row (the previous StockQuote), slotted StockQuote rows, and columns
+from fetch_quote_columns, all of them and only the ones a prediction run reads.
+
+    python -m benchmarks.bench_quote_batches --quotes 10000
+"""
+import argparse
+import dataclasses
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.bench_hot_paths import prepare_workdir  # noqa: E402
+from benchmarks.harness import measure  # noqa: E402
+
+
+def retained_bytes(build):
+    """
+    Bytes still allocated by the object build() returns, once its temporaries are freed.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def run(quotes, repeat):
+    from dataclass_db.dataclass_db_executor import fetch_quote_columns, fetch_quotes_batch, insert_stock_quotes
+    from dataclass_db.stock_predictions import StockQuote
+    from datasource.data_source import FakeBSE
+    from executors.jobs import PIPELINE_COLUMNS
+    from utils.db import get_db_pool
+
+    bse = FakeBSE(size=quotes)
+    insert_stock_quotes([bse.getQuote(code) for code in bse.getScripCodes()])
+
+    # StockQuote as it was before slots, for comparison
+    PlainStockQuote = dataclasses.make_dataclass(
+        'PlainStockQuote', [(field.name, field.type, dataclasses.field(default=field.default))
+                            for field in dataclasses.fields(StockQuote)])
+
+    def plain_rows():
+        with get_db_pool().connection() as conn:
+            rows = conn.execute('SELECT * FROM stock_quotes LIMIT ?', (quotes,)).fetchall()
+        return [PlainStockQuote(**{key: row[key] for key in row.keys()}) for row in rows]
+
+    variants = {
+        'plain_dataclass_rows': plain_rows,
+        'slotted_rows': lambda: fetch_quotes_batch(quotes),
+        'columns_all': lambda: fetch_quote_columns(limit=quotes),
+        'columns_pipeline': lambda: fetch_quote_columns(PIPELINE_COLUMNS, limit=quotes),
+    }
+    results = []
+    for name, build in variants.items():
+        timing = measure(build, repeat, items=quotes)
+        per_10k = 10000 / quotes
+        results.append({
+            'representation': name,
+            'quotes': quotes,
+            'build_p50_ms_per_10k': round(timing['p50_ms'] * per_10k, 3),
+            'build_p99_ms_per_10k': round(timing['p99_ms'] * per_10k, 3),
+            'memory_mb_per_10k': round(retained_bytes(build) * per_10k / 2 ** 20, 3),
+        })
+        print(json.dumps(results[-1]), flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quotes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='stock-sense-bench-')
+    try:
+        prepare_workdir(workdir)
+        run(args.quotes, args.repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Symbols trained per hour by the LSTM training pool as the worker count changes.
+
+    python -m benchmarks.bench_training_pool --symbols 8 --workers 1 2 4 --epochs 2
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.synthetic import synthetic_ohlcv
+from model.keras_model import prepare_training_data
+from model.training_pool import TrainingPool
+
+
+def run(symbols, worker_counts, epochs, bars):
+    training_data = [prepare_training_data(synthetic_ohlcv(bars=bars, seed=seed)) for seed in range(symbols)]
+    # Symbols are left out so every task trains from scratch instead of warm-starting from the registry
+    results = []
+    for workers in worker_counts:
+        pool = TrainingPool(workers=workers, epochs=epochs)
+        # Warm every worker so process start-up and the TensorFlow import are not measured
+        for future in [pool.submit(None, *training_data[0]) for _ in range(workers)]:
+            future.result()
+
+        started = time.perf_counter()
+        for future in [pool.submit(None, data, dates) for data, dates in training_data]:
+            future.result()
+        elapsed = time.perf_counter() - started
+        pool.shutdown()
+
+        results.append({
+            'workers': workers,
+            'intra_op_threads': pool.intra_op_threads,
+            'symbols': symbols,
+            'epochs': epochs,
+            'seconds': round(elapsed, 3),
+            'symbols_per_hour': round(symbols / elapsed * 3600, 1),
+        })
+        print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, default=8)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, max(1, (os.cpu_count() or 1) // 2)])
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--bars', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.symbols, sorted(set(args.workers)), args.epochs, args.bars)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import json
+import platform
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+def measure(fn, repeat, warmup=1, items=1):
+    """
+    Time repeated calls of fn.
+
+    Parameters:
+        fn (callable): The operation to time, called without arguments.
+        repeat (int): Timed calls.
+        warmup (int): Untimed calls made first, so caches and lazy imports are not measured.
+        items (int): Units of work per call (rows, quotes, ...), for the throughput figure.
+
+    Returns:
+        dict: calls, items_per_call, throughput_per_s, mean/p50/p99/min latency in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, items)
+
+
+def summarize(samples, items=1):
+    samples = np.asarray(samples)
+    total = samples.sum()
+    return {
+        'calls': len(samples),
+        'items_per_call': items,
+        'throughput_per_s': round(items * len(samples) / total, 3) if total else None,
+        'mean_ms': round(samples.mean() * 1000, 4),
+        'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 4),
+        'min_ms': round(samples.min() * 1000, 4),
+    }
+
+
+def environment():
+    """
+    Describes the machine a run was made on, stored next to its results.
+    """
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def compare(results, baseline, tolerance=0.10):
+    """
+    Compare a run against a baseline run, benchmark by benchmark.
+
+    A benchmark regressed when its p50 latency grew by more than tolerance (a fraction).
+
+    Returns:
+        tuple: (rows, regressions) where rows holds one dict per benchmark present in both runs and
+            regressions lists the names of the regressed benchmarks.
+    """
+    rows, regressions = [], []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        p50_change = current['p50_ms'] / previous['p50_ms'] - 1 if previous['p50_ms'] else 0.0
+        row = {
+            'benchmark': name,
+            'baseline_p50_ms': previous['p50_ms'],
+            'p50_ms': current['p50_ms'],
+            'p50_change': round(p50_change, 4),
+            'baseline_p99_ms': previous['p99_ms'],
+            'p99_ms': current['p99_ms'],
+        }
+        rows.append(row)
+        if p50_change > tolerance:
+            regressions.append(name)
+    return rows, regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, results, meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
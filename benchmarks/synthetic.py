@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+
+def synthetic_ohlcv(bars=3500, seed=0, start='2010-01-01', price=100.0):
+    """
+    Generate a geometric random walk of daily OHLCV bars shaped like a yfinance download.
+
+    Parameters:
+        bars (int): Number of business days to generate.
+        seed (int): Random seed, so runs are reproducible.
+        start (str): Date of the first bar.
+        price (float): Opening price of the first bar.
+
+    Returns:
+        pandas.DataFrame: Open/High/Low/Close/Adj Close/Volume indexed by Date.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(start, periods=bars, name='Date')
+    returns = rng.normal(0.0003, 0.02, bars)
+    close = price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([price], close[:-1])) * np.exp(rng.normal(0, 0.005, bars))
+    spread = np.abs(rng.normal(0, 0.01, bars))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(12, 1, bars).round()
+    return pd.DataFrame({
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Adj Close': close,
+        'Volume': volume,
+    }, index=index)
@@ -1,11 +1,147 @@
 import sqlite3
 
+from dataclass_db.dataclass_db_executor import (ORDER_BOOK_LEVELS, ORDER_BOOK_SIDES, UPSERT_ORDER_BOOK_SQL,
+                                               pack_order_book, parse_number)
+from utils.connection_pool import DB_PATH
 
+# Tables whose reads are served from the response cache; every write bumps their table_versions row
+# and records the written security_id in prediction_changes for the live update feed
+VERSIONED_TABLES = ('predictions_linear', 'predictions')
+PROFIT_COLUMN = 'profit REAL GENERATED ALWAYS AS (predicted_price - current_price) VIRTUAL'
+
+
+def _add_profit_column(c, table_name):
+    # Tables created before the profit column existed get it added in place
+    columns = [row[1] for row in c.execute(f'PRAGMA table_xinfo({table_name})')]
+    if 'profit' not in columns:
+        c.execute(f'ALTER TABLE {table_name} ADD COLUMN {PROFIT_COLUMN}')
+
+
+def _create_change_triggers(c, table_name):
+    c.execute('INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)', (table_name,))
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        # Recreated on every run so databases with older trigger bodies pick up the current one
+        c.execute(f'DROP TRIGGER IF EXISTS {table_name}_version_{event.lower()}')
+        c.execute(f'''
+            CREATE TRIGGER {table_name}_version_{event.lower()}
+            AFTER {event} ON {table_name}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE table_name = '{table_name}';
+                INSERT INTO prediction_changes (table_name, security_id, version)
+                SELECT '{table_name}', {row}.security_id, version FROM table_versions
+                WHERE table_name = '{table_name}' AND {row}.security_id IS NOT NULL
+                ON CONFLICT(table_name, security_id) DO UPDATE SET version = excluded.version;
+            END
+        ''')
+
+
+# Numbers are parsed at ingest: traded value and market caps in rupees, quantities in shares. Bid and
+# ask levels live in order_book, packed into one blob per stock (see pack_order_book).
+STOCK_QUOTES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS stock_quotes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        company_name TEXT,
+        current_value REAL,
+        change REAL,
+        p_change REAL,
+        updated_on TEXT,
+        security_id TEXT UNIQUE,
+        scrip_code TEXT,
+        group_type TEXT,
+        face_value REAL,
+        industry TEXT,
+        previous_close REAL,
+        previous_open REAL,
+        day_high REAL,
+        day_low REAL,
+        week_52_high REAL,
+        week_52_low REAL,
+        weighted_avg_price REAL,
+        total_traded_value REAL,
+        total_traded_quantity INTEGER,
+        two_week_avg_quantity INTEGER,
+        market_cap_full REAL,
+        market_cap_free_float REAL
+    )
+'''
+
+
+def _lenient_number(value):
+    # Legacy rows that do not parse become NULL instead of failing the migration
+    try:
+        return parse_number(value)
+    except ValueError:
+        return None
+
+
+def _lenient_quantity(value):
+    number = _lenient_number(value)
+    return None if number is None else round(number)
+
+
+def _migrate_typed_stock_quotes(c):
+    """
+    Schema 1: stock_quotes with numeric instead of TEXT quantities, traded values and market caps,
+    and the 20 bid/ask columns packed into order_book.
+    """
+    columns = [row[1] for row in c.execute('PRAGMA table_info(stock_quotes)')]
+    if 'buy_1_price' not in columns:
+        return
+    c.connection.create_function('parse_number', 1, _lenient_number, deterministic=True)
+    c.execute('ALTER TABLE stock_quotes RENAME TO stock_quotes_legacy')
+    c.execute(STOCK_QUOTES_TABLE_SQL)
+    c.execute('''
+        INSERT INTO stock_quotes
+        SELECT id, company_name, current_value, change, p_change, updated_on, security_id, scrip_code,
+               group_type, face_value, industry, previous_close, previous_open, day_high, day_low,
+               week_52_high, week_52_low, weighted_avg_price, parse_number(total_traded_value),
+               CAST(ROUND(parse_number(total_traded_quantity)) AS INTEGER),
+               CAST(ROUND(parse_number(two_week_avg_quantity)) AS INTEGER),
+               parse_number(market_cap_full), parse_number(market_cap_free_float)
+        FROM stock_quotes_legacy
+    ''')
+    book_columns = [f'{side}_{level}_{field}' for side in ORDER_BOOK_SIDES
+                    for level in range(1, ORDER_BOOK_LEVELS + 1) for field in ('price', 'quantity')]
+    rows = c.execute(f'''
+        SELECT security_id, {', '.join(book_columns)} FROM stock_quotes_legacy WHERE security_id IS NOT NULL
+    ''').fetchall()
+    c.executemany(UPSERT_ORDER_BOOK_SQL, [
+        (row[0], pack_order_book((_lenient_number(price), _lenient_quantity(quantity))
+                                 for price, quantity in zip(row[1::2], row[2::2])))
+        for row in rows
+    ])
+    c.execute('DROP TABLE stock_quotes_legacy')
+
+
+# Schema version -> migration bringing a database from the previous version to it. The version a
+# database is at is kept in PRAGMA user_version; every migration must also accept a database whose
+# tables create_db has just created in their current shape.
+MIGRATIONS = {
+    1: _migrate_typed_stock_quotes,
+}
+SCHEMA_VERSION = max(MIGRATIONS)
+
+
+def _migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target in sorted(target for target in MIGRATIONS if target > version):
+        print(f"Migrating database to schema {target}...")
+        conn.commit()
+        c = conn.cursor()
+        # One transaction per migration, including its user_version bump
+        c.execute('BEGIN IMMEDIATE')
+        try:
+            MIGRATIONS[target](c)
+            c.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
 
 def create_db():
     print("Creating database...")
-    conn = sqlite3.connect('utils/stock_predictions.db')
+    conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
 
     c.execute('''
@@ -16,7 +152,8 @@ def create_db():
             current_price REAL,
             predicted_price REAL,
             prediction_date TEXT,
-            active INTEGER DEFAULT 1
+            active INTEGER DEFAULT 1,
+            profit REAL GENERATED ALWAYS AS (predicted_price - current_price) VIRTUAL
         )
     ''')
 
@@ -38,56 +175,18 @@ def create_db():
             security_id TEXT UNIQUE,
             current_price REAL,
             predicted_price REAL,
-            prediction_date TEXT
+            prediction_date TEXT,
+            profit REAL GENERATED ALWAYS AS (predicted_price - current_price) VIRTUAL
         )''')
 
+    c.execute(STOCK_QUOTES_TABLE_SQL)
+
     c.execute('''
-            CREATE TABLE IF NOT EXISTS stock_quotes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_name TEXT,
-                current_value REAL,
-                change REAL,
-                p_change REAL,
-                updated_on TEXT,
-                security_id TEXT UNIQUE,
-                scrip_code TEXT,
-                group_type TEXT,
-                face_value REAL,
-                industry TEXT,
-                previous_close REAL,
-                previous_open REAL,
-                day_high REAL,
-                day_low REAL,
-                week_52_high REAL,
-                week_52_low REAL,
-                weighted_avg_price REAL,
-                total_traded_value TEXT,
-                total_traded_quantity TEXT,
-                two_week_avg_quantity TEXT,
-                market_cap_full TEXT,
-                market_cap_free_float TEXT,
-                buy_1_quantity TEXT,
-                buy_1_price REAL,
-                buy_2_quantity TEXT,
-                buy_2_price REAL,
-                buy_3_quantity TEXT,
-                buy_3_price REAL,
-                buy_4_quantity TEXT,
-                buy_4_price REAL,
-                buy_5_quantity TEXT,
-                buy_5_price REAL,
-                sell_1_quantity TEXT,
-                sell_1_price REAL,
-                sell_2_quantity TEXT,
-                sell_2_price REAL,
-                sell_3_quantity TEXT,
-                sell_3_price REAL,
-                sell_4_quantity TEXT,
-                sell_4_price REAL,
-                sell_5_quantity TEXT,
-                sell_5_price REAL
-            )
-        ''')
+        CREATE TABLE IF NOT EXISTS order_book (
+            security_id TEXT PRIMARY KEY,
+            levels BLOB NOT NULL
+        ) WITHOUT ROWID
+    ''')
 
     c.execute('''
         CREATE UNIQUE INDEX IF NOT EXISTS idx_security_id_linear
@@ -104,7 +203,73 @@ def create_db():
         ON predictions (security_id)
         ''')
 
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # One row per changed stock holding the table version of its latest write, so a burst of writes
+    # to the same stock collapses into a single entry
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS prediction_changes (
+            table_name TEXT NOT NULL,
+            security_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (table_name, security_id)
+        ) WITHOUT ROWID
+    ''')
+
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_prediction_changes_version
+        ON prediction_changes (table_name, version)
+    ''')
+
+    for table_name in VERSIONED_TABLES:
+        _add_profit_column(c, table_name)
+        _create_change_triggers(c, table_name)
+
+    # Scheduler workers split the scrip codes between them by leasing them from this table
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS work_leases (
+            scrip_code TEXT PRIMARY KEY,
+            owner TEXT,
+            lease_expires REAL NOT NULL DEFAULT 0,
+            heartbeat REAL
+        )
+    ''')
+
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_work_leases_owner
+        ON work_leases (owner)
+    ''')
+
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_work_leases_expires
+        ON work_leases (lease_expires)
+    ''')
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS work_owners (
+            owner TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        )
+    ''')
+
+    # Listings are read ordered by profit; these indexes return them in order without a sort
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_profit_linear
+        ON predictions_linear (profit DESC, security_id) WHERE active = 1
+    ''')
+
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_profit
+        ON predictions (profit DESC, security_id)
+    ''')
+
     conn.commit()
+    _migrate(conn)
     conn.close()
 
 if  __name__ == '__main__':
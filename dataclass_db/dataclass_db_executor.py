@@ -1,212 +1,543 @@
+import logging
+import math
 import sqlite3
+import struct
+import time
+from dataclasses import asdict, fields
+from typing import get_args
 
-from dataclass_db.stock_predictions import StockQuote
-from utils.util import get_db_connection
+from dataclass_db.stock_predictions import OrderBookLevel, StockQuote
+from utils.metrics import timed
+from utils.db import get_db_pool
 
 
 def execute_query(query, args=(), fetchone=False, fetchall=False, commit=False):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(query, args)
-        if commit:
-            conn.commit()
-        if fetchone:
-            result = cursor.fetchone()
-        elif fetchall:
-            result = cursor.fetchall()
-        else:
+    with get_db_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, args)
+            if commit:
+                conn.commit()
+            if fetchone:
+                result = cursor.fetchone()
+            elif fetchall:
+                result = cursor.fetchall()
+            else:
+                result = None
+        except Exception as e:
+            print(f"An error occurred while executing query: {query}: {e}")
             result = None
-    except Exception as e:
-        print(f"An error occurred while executing query: {query}: {e}")
-        result = None
-    finally:
-        conn.close()
     return result
 
-def insert_stock_quote(quote):
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    # Insert data into the table
-    data = {
-        'company_name': quote.get('companyName', None),
-        'current_value': float(quote.get('currentValue', 0.0)),
-        'change': float(quote.get('change', 0.0)),
-        'p_change': float(quote.get('pChange', 0.0)),
-        'updated_on': quote.get('updatedOn', None),
-        'security_id': quote.get('securityID', None),
-        'scrip_code': quote.get('scripCode', None),
-        'group_type': quote.get('group', None),
-        'face_value': float(quote.get('faceValue', 0.0)),
-        'industry': quote.get('industry', None),
-        'previous_close': float(quote.get('previousClose', 0.0)),
-        'previous_open': float(quote.get('previousOpen', 0.0)),
-        'day_high': float(quote.get('dayHigh', 0.0)),
-        'day_low': float(quote.get('dayLow', 0.0)),
-        'week_52_high': float(quote.get('52weekHigh', 0.0)),
-        'week_52_low': float(quote.get('52weekLow', 0.0)),
-        'weighted_avg_price': float(quote.get('weightedAvgPrice', 0.0)),
-        'total_traded_value': quote.get('totalTradedValue', None),
-        'total_traded_quantity': quote.get('totalTradedQuantity', None),
-        'two_week_avg_quantity': quote.get('2WeekAvgQuantity', None),
-        'market_cap_full': quote.get('marketCapFull', None),
-        'market_cap_free_float': quote.get('marketCapFreeFloat', None),
-        'buy_1_quantity': quote.get('buy', {}).get('1', {}).get('quantity', None),
-        'buy_1_price': float(quote.get('buy', {}).get('1', {}).get('price', 0.0)),
-        'buy_2_quantity': quote.get('buy', {}).get('2', {}).get('quantity', None),
-        'buy_2_price': float(quote.get('buy', {}).get('2', {}).get('price', 0.0)),
-        'buy_3_quantity': quote.get('buy', {}).get('3', {}).get('quantity', None),
-        'buy_3_price': float(quote.get('buy', {}).get('3', {}).get('price', 0.0)),
-        'buy_4_quantity': quote.get('buy', {}).get('4', {}).get('quantity', None),
-        'buy_4_price': float(quote.get('buy', {}).get('4', {}).get('price', 0.0)),
-        'buy_5_quantity': quote.get('buy', {}).get('5', {}).get('quantity', None),
-        'buy_5_price': float(quote.get('buy', {}).get('5', {}).get('price', 0.0)),
-        'sell_1_quantity': quote.get('sell', {}).get('1', {}).get('quantity', None),
-        'sell_1_price': float(quote.get('sell', {}).get('1', {}).get('price', 0.0)),
-        'sell_2_quantity': quote.get('sell', {}).get('2', {}).get('quantity', None),
-        'sell_2_price': float(quote.get('sell', {}).get('2', {}).get('price', 0.0)),
-        'sell_3_quantity': quote.get('sell', {}).get('3', {}).get('quantity', None),
-        'sell_3_price': float(quote.get('sell', {}).get('3', {}).get('price', 0.0)),
-        'sell_4_quantity': quote.get('sell', {}).get('4', {}).get('quantity', None),
-        'sell_4_price': float(quote.get('sell', {}).get('4', {}).get('price', 0.0)),
-        'sell_5_quantity': quote.get('sell', {}).get('5', {}).get('quantity', None),
-        'sell_5_price': float(quote.get('sell', {}).get('5', {}).get('price', 0.0))
-    }
 
+UPSERT_STOCK_QUOTE_SQL = '''
+    INSERT INTO stock_quotes (
+        company_name, current_value, change, p_change, updated_on,
+        security_id, scrip_code, group_type, face_value, industry,
+        previous_close, previous_open, day_high, day_low, week_52_high,
+        week_52_low, weighted_avg_price, total_traded_value, total_traded_quantity,
+        two_week_avg_quantity, market_cap_full, market_cap_free_float
+    ) VALUES (
+        :company_name, :current_value, :change, :p_change, :updated_on,
+        :security_id, :scrip_code, :group_type, :face_value, :industry,
+        :previous_close, :previous_open, :day_high, :day_low, :week_52_high,
+        :week_52_low, :weighted_avg_price, :total_traded_value, :total_traded_quantity,
+        :two_week_avg_quantity, :market_cap_full, :market_cap_free_float
+    )
+    ON CONFLICT(security_id) DO UPDATE SET
+        company_name=excluded.company_name,
+        current_value=excluded.current_value,
+        change=excluded.change,
+        p_change=excluded.p_change,
+        updated_on=excluded.updated_on,
+        scrip_code=excluded.scrip_code,
+        group_type=excluded.group_type,
+        face_value=excluded.face_value,
+        industry=excluded.industry,
+        previous_close=excluded.previous_close,
+        previous_open=excluded.previous_open,
+        day_high=excluded.day_high,
+        day_low=excluded.day_low,
+        week_52_high=excluded.week_52_high,
+        week_52_low=excluded.week_52_low,
+        weighted_avg_price=excluded.weighted_avg_price,
+        total_traded_value=excluded.total_traded_value,
+        total_traded_quantity=excluded.total_traded_quantity,
+        two_week_avg_quantity=excluded.two_week_avg_quantity,
+        market_cap_full=excluded.market_cap_full,
+        market_cap_free_float=excluded.market_cap_free_float
+'''
+
+UPSERT_ORDER_BOOK_SQL = '''
+    INSERT INTO order_book (security_id, levels) VALUES (?, ?)
+    ON CONFLICT(security_id) DO UPDATE SET levels=excluded.levels
+'''
+
+UPSERT_PREDICTION_SQL = {
+    'predictions_linear': '''
+        INSERT INTO predictions_linear (company_name, security_id, current_price, predicted_price, prediction_date, active)
+        VALUES (:company_name, :security_id, :current_price, :predicted_price, :prediction_date, :active)
+        ON CONFLICT(security_id) DO UPDATE SET
+            company_name=excluded.company_name,
+            current_price=excluded.current_price,
+            predicted_price=excluded.predicted_price,
+            prediction_date=excluded.prediction_date,
+            active=excluded.active
+    ''',
+    'predictions': '''
+        INSERT INTO predictions (company_name, security_id, current_price, predicted_price, prediction_date)
+        VALUES (:company_name, :security_id, :current_price, :predicted_price, :prediction_date)
+        ON CONFLICT(security_id) DO UPDATE SET
+            company_name=excluded.company_name,
+            current_price=excluded.current_price,
+            predicted_price=excluded.predicted_price,
+            prediction_date=excluded.prediction_date
+    ''',
+}
+
+BULK_CHUNK_SIZE = 500
+
+
+# Unit suffixes BSE appends to traded values, market caps and quantities
+NUMBER_UNITS = {'cr.': 1e7, 'cr': 1e7, 'crore': 1e7, 'lakh': 1e5, 'lakhs': 1e5}
+ORDER_BOOK_SIDES = ('buy', 'sell')
+ORDER_BOOK_LEVELS = 5
+# order_book.levels: (price, quantity) of buy levels 1-5 then sell levels 1-5 as little-endian
+# doubles, NaN where the quote has no value
+ORDER_BOOK_STRUCT = struct.Struct(f'<{len(ORDER_BOOK_SIDES) * ORDER_BOOK_LEVELS * 2}d')
+
+
+def parse_number(value):
+    """
+    Parse a BSE number such as '1,234.50', '12,34,567', '2.51 Cr.' or '0.97 Lakh'.
+
+    Returns:
+        float or None: The value in base units (rupees, shares), None for missing values or '-'.
+
+    Raises:
+        ValueError: When value is not a number or has an unknown unit.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str) and ',' in value:
+        value = value.replace(',', '')
     try:
-        c.execute('''
-            INSERT INTO stock_quotes (
-                company_name, current_value, change, p_change, updated_on,
-                security_id, scrip_code, group_type, face_value, industry,
-                previous_close, previous_open, day_high, day_low, week_52_high, 
-                week_52_low, weighted_avg_price, total_traded_value, total_traded_quantity, 
-                two_week_avg_quantity, market_cap_full, market_cap_free_float,
-                buy_1_quantity, buy_1_price, buy_2_quantity, buy_2_price, 
-                buy_3_quantity, buy_3_price, buy_4_quantity, buy_4_price, 
-                buy_5_quantity, buy_5_price, sell_1_quantity, sell_1_price, 
-                sell_2_quantity, sell_2_price, sell_3_quantity, sell_3_price, 
-                sell_4_quantity, sell_4_price, sell_5_quantity, sell_5_price
-            ) VALUES (
-                :company_name, :current_value, :change, :p_change, :updated_on,
-                :security_id, :scrip_code, :group_type, :face_value, :industry,
-                :previous_close, :previous_open, :day_high, :day_low, :week_52_high, 
-                :week_52_low, :weighted_avg_price, :total_traded_value, :total_traded_quantity, 
-                :two_week_avg_quantity, :market_cap_full, :market_cap_free_float,
-                :buy_1_quantity, :buy_1_price, :buy_2_quantity, :buy_2_price, 
-                :buy_3_quantity, :buy_3_price, :buy_4_quantity, :buy_4_price, 
-                :buy_5_quantity, :buy_5_price, :sell_1_quantity, :sell_1_price, 
-                :sell_2_quantity, :sell_2_price, :sell_3_quantity, :sell_3_price, 
-                :sell_4_quantity, :sell_4_price, :sell_5_quantity, :sell_5_price
-            )
-            ON CONFLICT(security_id) DO UPDATE SET
-                company_name=excluded.company_name,
-                current_value=excluded.current_value,
-                change=excluded.change,
-                p_change=excluded.p_change,
-                updated_on=excluded.updated_on,
-                scrip_code=excluded.scrip_code,
-                group_type=excluded.group_type,
-                face_value=excluded.face_value,
-                industry=excluded.industry,
-                previous_close=excluded.previous_close,
-                previous_open=excluded.previous_open,
-                day_high=excluded.day_high,
-                day_low=excluded.day_low,
-                week_52_high=excluded.week_52_high,
-                week_52_low=excluded.week_52_low,
-                weighted_avg_price=excluded.weighted_avg_price,
-                total_traded_value=excluded.total_traded_value,
-                total_traded_quantity=excluded.total_traded_quantity,
-                two_week_avg_quantity=excluded.two_week_avg_quantity,
-                market_cap_full=excluded.market_cap_full,
-                market_cap_free_float=excluded.market_cap_free_float,
-                buy_1_quantity=excluded.buy_1_quantity,
-                buy_1_price=excluded.buy_1_price,
-                buy_2_quantity=excluded.buy_2_quantity,
-                buy_2_price=excluded.buy_2_price,
-                buy_3_quantity=excluded.buy_3_quantity,
-                buy_3_price=excluded.buy_3_price,
-                buy_4_quantity=excluded.buy_4_quantity,
-                buy_4_price=excluded.buy_4_price,
-                buy_5_quantity=excluded.buy_5_quantity,
-                buy_5_price=excluded.buy_5_price,
-                sell_1_quantity=excluded.sell_1_quantity,
-                sell_1_price=excluded.sell_1_price,
-                sell_2_quantity=excluded.sell_2_quantity,
-                sell_2_price=excluded.sell_2_price,
-                sell_3_quantity=excluded.sell_3_quantity,
-                sell_3_price=excluded.sell_3_price,
-                sell_4_quantity=excluded.sell_4_quantity,
-                sell_4_price=excluded.sell_4_price,
-                sell_5_quantity=excluded.sell_5_quantity,
-                sell_5_price=excluded.sell_5_price
-        ''', data)
-
-        conn.commit()
-    except sqlite3.IntegrityError as e:
-        print(f"Error occurred: {e}")
-    finally:
-        conn.close()
+        # Most fields are plain numbers; only values with a unit or a placeholder need more work
+        return float(value)
+    except ValueError:
+        pass
+    text = value.strip()
+    if not text or text == '-':
+        return None
+    number, _, unit = text.partition(' ')
+    if not unit:
+        return float(number)
+    scale = NUMBER_UNITS.get(unit.strip().lower())
+    if scale is None:
+        raise ValueError(f"Unknown unit in {value!r}")
+    # Rounded to paise so '2.51 Cr.' is 25100000.0 and not 25099999.999999996
+    return round(float(number) * scale, 2)
+
+
+def parse_quantity(value):
+    number = parse_number(value)
+    return None if number is None else int(round(number))
+
+
+def quote_to_row(quote):
+    """
+    Map a bsedata getQuote dict to the named parameters of UPSERT_STOCK_QUOTE_SQL, parsing every
+    numeric field once here so stock_quotes only holds numbers.
+    """
+    return {
+        'company_name': quote.get('companyName'),
+        'current_value': parse_number(quote.get('currentValue', 0.0)),
+        'change': parse_number(quote.get('change', 0.0)),
+        'p_change': parse_number(quote.get('pChange', 0.0)),
+        'updated_on': quote.get('updatedOn'),
+        'security_id': quote.get('securityID'),
+        'scrip_code': quote.get('scripCode'),
+        'group_type': quote.get('group'),
+        'face_value': parse_number(quote.get('faceValue', 0.0)),
+        'industry': quote.get('industry'),
+        'previous_close': parse_number(quote.get('previousClose', 0.0)),
+        'previous_open': parse_number(quote.get('previousOpen', 0.0)),
+        'day_high': parse_number(quote.get('dayHigh', 0.0)),
+        'day_low': parse_number(quote.get('dayLow', 0.0)),
+        'week_52_high': parse_number(quote.get('52weekHigh', 0.0)),
+        'week_52_low': parse_number(quote.get('52weekLow', 0.0)),
+        'weighted_avg_price': parse_number(quote.get('weightedAvgPrice', 0.0)),
+        'total_traded_value': parse_number(quote.get('totalTradedValue')),
+        'total_traded_quantity': parse_quantity(quote.get('totalTradedQuantity')),
+        'two_week_avg_quantity': parse_quantity(quote.get('2WeekAvgQuantity')),
+        'market_cap_full': parse_number(quote.get('marketCapFull')),
+        'market_cap_free_float': parse_number(quote.get('marketCapFreeFloat')),
+    }
+
+
+def pack_order_book(levels):
+    """
+    Pack (price, quantity) pairs, buy levels 1-5 then sell levels 1-5, into an order_book.levels blob.
+    """
+    values = []
+    for price, quantity in levels:
+        values.append(math.nan if price is None else price)
+        values.append(math.nan if quantity is None else quantity)
+    return ORDER_BOOK_STRUCT.pack(*values)
+
+
+def unpack_order_book(security_id, blob):
+    """
+    Returns:
+        list: OrderBookLevel per side and level, buy side first, best level first.
+    """
+    values = [None if math.isnan(value) else value for value in ORDER_BOOK_STRUCT.unpack(blob)]
+    levels = []
+    for index in range(0, len(values), 2):
+        side, level = divmod(index // 2, ORDER_BOOK_LEVELS)
+        quantity = values[index + 1]
+        levels.append(OrderBookLevel(security_id, ORDER_BOOK_SIDES[side], level + 1, values[index],
+                                     None if quantity is None else int(quantity)))
+    return levels
+
+
+def order_book_row(quote):
+    """
+    Parameters of UPSERT_ORDER_BOOK_SQL for the bid and ask levels of a getQuote dict.
+    """
+    levels = []
+    for side in ORDER_BOOK_SIDES:
+        entries = quote.get(side) or {}
+        for level in range(1, ORDER_BOOK_LEVELS + 1):
+            entry = entries.get(str(level)) or {}
+            levels.append((parse_number(entry.get('price')), parse_quantity(entry.get('quantity'))))
+    return quote.get('securityID'), pack_order_book(levels)
+
+
+def _executemany_chunked(statements, rows, chunk_size, label):
+    """
+    Run every statement for every row, with one executemany per statement and one commit per chunk.
+
+    A chunk that fails is rolled back and written again row by row, so a bad row only loses itself.
+
+    Parameters:
+        statements (tuple): SQL statements written together in each transaction.
+        rows (iterable): For every row, a tuple with the parameters of each statement.
+        chunk_size (int): Rows per transaction.
+        label (str): Name used in the log messages.
+
+    Returns:
+        int: Number of rows written.
+    """
+    started = time.perf_counter()
+    written = 0
+    with get_db_pool().connection() as conn:
+        for chunk in _chunks(rows, chunk_size):
+            try:
+                _write_chunk(conn, statements, chunk)
+                written += len(chunk)
+            except sqlite3.Error as e:
+                conn.rollback()
+                print(f"Error occurred while writing {len(chunk)} rows to {label}, retrying them one by one: {e}")
+                written += _write_rows(conn, statements, chunk, label)
+    elapsed = time.perf_counter() - started
+    if written:
+        logging.info(f"Wrote {written} rows to {label} in {elapsed:.3f}s ({written / elapsed if elapsed else 0:.0f} rows/s)")
+    return written
+
+
+def _write_chunk(conn, statements, chunk):
+    for index, sql in enumerate(statements):
+        conn.executemany(sql, [row[index] for row in chunk])
+    conn.commit()
+
+
+def _write_rows(conn, statements, chunk, label):
+    # One transaction per row, so the rows of a failed chunk that are fine still get written
+    written = 0
+    for row in chunk:
+        try:
+            _write_chunk(conn, statements, [row])
+            written += 1
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Error occurred while writing a row to {label}: {e}")
+    return written
+
+
+def _chunks(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@timed('insert_stock_quote')
+def insert_stock_quote(quote):
+    insert_stock_quotes([quote])
+
+
+@timed('insert_stock_quotes')
+def insert_stock_quotes(quotes, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Upsert many bsedata quotes into stock_quotes and their bid/ask levels into order_book, one
+    transaction per chunk.
+
+    Parameters:
+        quotes (iterable): Quote dicts as returned by getQuote.
+        chunk_size (int): Quotes written per executemany/commit.
+
+    Returns:
+        int: Number of quotes written.
+    """
+    return _executemany_chunked((UPSERT_STOCK_QUOTE_SQL, UPSERT_ORDER_BOOK_SQL), _quote_rows(quotes), chunk_size,
+                                'stock_quotes')
+
+
+def _quote_rows(quotes):
+    for quote in quotes:
+        try:
+            yield quote_to_row(quote), order_book_row(quote)
+        except (TypeError, ValueError) as e:
+            print(f"Skipping malformed quote {quote.get('securityID')}: {e}")
 
 
+@timed('upsert_predictions')
+def upsert_predictions(predictions, table='predictions_linear', chunk_size=BULK_CHUNK_SIZE):
+    """
+    Upsert many predictions keyed by security_id, one transaction per chunk.
+
+    Parameters:
+        predictions (iterable): PredictionLinear/Prediction instances or dicts with the same fields.
+        table (str): 'predictions_linear' or 'predictions'.
+        chunk_size (int): Rows written per executemany/commit.
+
+    Returns:
+        int: Number of rows written.
+    """
+    rows = ((prediction if isinstance(prediction, dict) else asdict(prediction),) for prediction in predictions)
+    return _executemany_chunked((UPSERT_PREDICTION_SQL[table],), rows, chunk_size, table)
+
+
+def _column_dtype(field):
+    # Numeric columns become float64 arrays with NaN for NULL; only the id primary key is never NULL
+    if field.name == 'id':
+        return 'int64'
+    base = next((arg for arg in get_args(field.type) if arg is not type(None)), field.type)
+    return 'float64' if base in (float, int) else 'object'
+
+
+# stock_quotes columns in StockQuote field order, so a selected row maps onto StockQuote(*row)
+QUOTE_COLUMNS = tuple(field.name for field in fields(StockQuote))
+QUOTE_COLUMN_DTYPES = {field.name: _column_dtype(field) for field in fields(StockQuote)}
+SELECT_QUOTES_SQL = f'SELECT {", ".join(QUOTE_COLUMNS)} FROM stock_quotes'
+_QUOTE_ID_INDEX = QUOTE_COLUMNS.index('id')
+
+
+@timed('fetch_quotes_batch')
 def fetch_quotes_batch(batch_size, offset=0):
-    conn = get_db_connection()
-    c = conn.cursor()
-
-    c.execute('''
-        SELECT * FROM stock_quotes LIMIT ? OFFSET ?
-    ''', (batch_size, offset))
-
-    rows = c.fetchall()
-    conn.close()
-
-    stock_quotes = [
-        StockQuote(
-            id=row[0],
-            company_name=row[1],
-            current_value=row[2],
-            change=row[3],
-            p_change=row[4],
-            updated_on=row[5],
-            security_id=row[6],
-            scrip_code=row[7],
-            group_type=row[8],
-            face_value=row[9],
-            industry=row[10],
-            previous_close=row[11],
-            previous_open=row[12],
-            day_high=row[13],
-            day_low=row[14],
-            week_52_high=row[15],
-            week_52_low=row[16],
-            weighted_avg_price=row[17],
-            total_traded_value=row[18],
-            total_traded_quantity=row[19],
-            two_week_avg_quantity=row[20],
-            market_cap_full=row[21],
-            market_cap_free_float=row[22],
-            buy_1_quantity=row[23],
-            buy_1_price=row[24],
-            buy_2_quantity=row[25],
-            buy_2_price=row[26],
-            buy_3_quantity=row[27],
-            buy_3_price=row[28],
-            buy_4_quantity=row[29],
-            buy_4_price=row[30],
-            buy_5_quantity=row[31],
-            buy_5_price=row[32],
-            sell_1_quantity=row[33],
-            sell_1_price=row[34],
-            sell_2_quantity=row[35],
-            sell_2_price=row[36],
-            sell_3_quantity=row[37],
-            sell_3_price=row[38],
-            sell_4_quantity=row[39],
-            sell_4_price=row[40],
-            sell_5_quantity=row[41],
-            sell_5_price=row[42]
-        ) for row in rows
-    ]
-
-    return stock_quotes
\ No newline at end of file
+    with get_db_pool().connection() as conn:
+        cursor = conn.cursor()
+        # Plain tuples are cheaper to build than sqlite3.Row and already in StockQuote field order
+        cursor.row_factory = None
+        rows = cursor.execute(f'{SELECT_QUOTES_SQL} LIMIT ? OFFSET ?', (batch_size, offset)).fetchall()
+
+    return [StockQuote(*row) for row in rows]
+
+
+def iter_quotes(chunk_size=500, where=None, args=(), changed_since=None):
+    """
+    Lazily yield every stock quote in id order.
+
+    Rows are read chunk_size at a time with keyset pagination on id over one pooled connection and
+    cursor, so each chunk is an index range scan instead of an ever-growing OFFSET.
+
+    Parameters:
+        chunk_size (int): Rows read per query.
+        where (str, optional): Extra SQL condition, e.g. 'current_value > ?'.
+        args (tuple, optional): Parameters for where.
+        changed_since (dict, optional): security_id -> updated_on from a previous pass; quotes whose
+            updated_on is unchanged are skipped.
+
+    Yields:
+        StockQuote: One quote at a time.
+    """
+    query = f'{SELECT_QUOTES_SQL} WHERE id > ?'
+    if where:
+        query += f' AND ({where})'
+    query += ' ORDER BY id LIMIT ?'
+
+    last_id = 0
+    with get_db_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        while True:
+            rows = cursor.execute(query, (last_id, *args, chunk_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                quote = StockQuote(*row)
+                if changed_since is not None and changed_since.get(quote.security_id) == quote.updated_on:
+                    continue
+                yield quote
+            last_id = rows[-1][_QUOTE_ID_INDEX]
+
+
+def _check_quote_columns(columns):
+    columns = QUOTE_COLUMNS if columns is None else tuple(columns)
+    unknown = set(columns) - set(QUOTE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown stock_quotes columns: {', '.join(sorted(unknown))}")
+    return columns
+
+
+def rows_to_columns(columns, rows):
+    """
+    Transpose tuple rows into a dict column -> numpy array. Numeric columns become float64 arrays
+    (NULL -> NaN), id an int64 array and text columns object arrays.
+    """
+    # numpy is only loaded by the columnar readers, which the read-only API does not use
+    import numpy as np
+
+    values = zip(*rows) if rows else [()] * len(columns)
+    return {name: np.array(column, dtype=QUOTE_COLUMN_DTYPES[name]) for name, column in zip(columns, values)}
+
+
+@timed('fetch_quote_columns')
+def fetch_quote_columns(columns=None, where=None, args=(), limit=None, offset=0):
+    """
+    Read stock quotes as columns instead of StockQuote objects.
+
+    Parameters:
+        columns (iterable, optional): stock_quotes columns to read, e.g. ('security_id', 'current_value').
+            Defaults to all of them.
+        where (str, optional): SQL condition, e.g. 'current_value > ?'.
+        args (tuple, optional): Parameters for where.
+        limit (int, optional): Maximum number of rows, in id order.
+        offset (int): Rows skipped before the first one returned.
+
+    Returns:
+        dict: Column name -> numpy array, all of the same length.
+    """
+    columns = _check_quote_columns(columns)
+    query = f'SELECT {", ".join(columns)} FROM stock_quotes'
+    if where:
+        query += f' WHERE {where}'
+    query += ' ORDER BY id'
+    if limit is not None:
+        query += ' LIMIT ? OFFSET ?'
+        args = (*args, limit, offset)
+    with get_db_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        rows = cursor.execute(query, args).fetchall()
+    return rows_to_columns(columns, rows)
+
+
+def iter_quote_columns(chunk_size=5000, columns=None, where=None, args=()):
+    """
+    Lazily yield every stock quote in id order as column chunks, with the same keyset pagination as
+    iter_quotes.
+
+    Yields:
+        dict: Column name -> numpy array for up to chunk_size quotes.
+    """
+    columns = _check_quote_columns(columns)
+    # id is read along so the next chunk can continue after the last row
+    read = columns if 'id' in columns else columns + ('id',)
+    query = f'SELECT {", ".join(read)} FROM stock_quotes WHERE id > ?'
+    if where:
+        query += f' AND ({where})'
+    query += ' ORDER BY id LIMIT ?'
+
+    last_id = 0
+    with get_db_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        while True:
+            rows = cursor.execute(query, (last_id, *args, chunk_size)).fetchall()
+            if not rows:
+                return
+            chunk = rows_to_columns(read, rows)
+            last_id = int(chunk['id'][-1])
+            if read is not columns:
+                del chunk['id']
+            yield chunk
+
+
+def fetch_order_book(security_id):
+    """
+    Bid and ask levels stored for one stock, buy side first, best level first.
+
+    Returns:
+        list: OrderBookLevel instances.
+    """
+    with get_db_pool().connection() as conn:
+        row = conn.execute('SELECT levels FROM order_book WHERE security_id = ?', (security_id,)).fetchone()
+    return unpack_order_book(security_id, row[0]) if row else []
+
+
+# Rows each prediction listing exposes; the linear table only lists stocks still marked active
+LISTING_FILTERS = {
+    'predictions_linear': 'active = 1',
+    'predictions': '1 = 1',
+}
+
+
+def fetch_predictions_page(table, limit=None, min_profit=None, after=None):
+    """
+    Predictions ordered by profit, highest first, read in order from the table's profit index.
+
+    Pages are keyset-paginated on (profit, security_id): each page seeks straight to the row after
+    the previous one, so the cost of a page does not grow with its position. Rows without a profit
+    (a missing price) cannot be ranked and are not listed.
+
+    Parameters:
+        table (str): 'predictions_linear' or 'predictions'.
+        limit (int, optional): Maximum rows returned. Defaults to all of them.
+        min_profit (float, optional): Only rows with at least this profit.
+        after (tuple, optional): (profit, security_id) of the last row of the previous page.
+
+    Returns:
+        list: One dict per row.
+    """
+    query = f'''
+        SELECT company_name, security_id, current_price, predicted_price, profit
+        FROM {table}
+        WHERE {LISTING_FILTERS[table]} AND profit IS NOT NULL
+    '''
+    args = []
+    if min_profit is not None:
+        query += ' AND profit >= ?'
+        args.append(min_profit)
+    if after is not None:
+        # The first condition bounds the index range; the second only filters ties at that profit
+        query += ' AND profit <= ? AND (profit < ? OR security_id > ?)'
+        args.extend((after[0], after[0], after[1]))
+    query += ' ORDER BY profit DESC, security_id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        args.append(limit)
+
+    with get_db_pool().connection() as conn:
+        return [dict(row) for row in conn.execute(query, args)]
+
+
+def iter_predictions(table, min_profit=None, chunk_size=500):
+    """
+    Lazily yield every listed prediction of table, highest profit first.
+
+    Unlike iter_quotes a connection is only held while a page is read, since the consumer is usually
+    a streamed HTTP response that can stay open for as long as the client takes to read it.
+    """
+    after = None
+    while True:
+        rows = fetch_predictions_page(table, chunk_size, min_profit, after)
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1]['profit'], rows[-1]['security_id'])
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
 
-@dataclass
+@dataclass(slots=True)
 class StockQuote:
     company_name: str
     current_value: float
@@ -21,34 +21,23 @@ class StockQuote:
     week_52_high: float
     week_52_low: float
     weighted_avg_price: float
-    total_traded_value: str
-    total_traded_quantity: str
-    two_week_avg_quantity: str
-    market_cap_full: str
-    market_cap_free_float: str
-    buy_1_quantity: Optional[str] = None
-    buy_1_price: Optional[float] = None
-    buy_2_quantity: Optional[str] = None
-    buy_2_price: Optional[float] = None
-    buy_3_quantity: Optional[str] = None
-    buy_3_price: Optional[float] = None
-    buy_4_quantity: Optional[str] = None
-    buy_4_price: Optional[float] = None
-    buy_5_quantity: Optional[str] = None
-    buy_5_price: Optional[float] = None
-    sell_1_quantity: Optional[str] = None
-    sell_1_price: Optional[float] = None
-    sell_2_quantity: Optional[str] = None
-    sell_2_price: Optional[float] = None
-    sell_3_quantity: Optional[str] = None
-    sell_3_price: Optional[float] = None
-    sell_4_quantity: Optional[str] = None
-    sell_4_price: Optional[float] = None
-    sell_5_quantity: Optional[str] = None
-    sell_5_price: Optional[float] = None
+    # Parsed at ingest: traded value and market caps in rupees, quantities in shares
+    total_traded_value: Optional[float]
+    total_traded_quantity: Optional[int]
+    two_week_avg_quantity: Optional[int]
+    market_cap_full: Optional[float]
+    market_cap_free_float: Optional[float]
     id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
+class OrderBookLevel:
+    security_id: str
+    side: str
+    level: int
+    price: Optional[float]
+    quantity: Optional[int]
+
+@dataclass(slots=True)
 class PredictionLinear:
     company_name: str
     security_id: str
@@ -58,7 +47,7 @@ class PredictionLinear:
     active: Optional[int] = 1
     id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class PredictionLSTM:
     company_name: str
     security_id: str
@@ -67,7 +56,7 @@ class PredictionLSTM:
     prediction_date: datetime
     id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class Prediction:
     company_name: str
     security_id: str
@@ -0,0 +1,73 @@
+import logging
+import threading
+
+
+class WriteBehindBuffer:
+    """
+    Collects rows in memory and hands them to a bulk writer every max_rows rows or max_delay_ms
+    milliseconds, whichever comes first.
+
+    Usage:
+        with WriteBehindBuffer(insert_stock_quotes, max_rows=500) as buffer:
+            buffer.add(quote)
+    """
+
+    def __init__(self, flush_fn, max_rows=500, max_delay_ms=1000):
+        self._flush_fn = flush_fn
+        self._max_rows = max_rows
+        self._max_delay = max_delay_ms / 1000.0
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.rows_written = 0
+        self.flushes = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, row):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self._max_rows
+        if full:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        """
+        Write everything buffered so far. Returns the number of rows handed to the writer.
+        """
+        # Flushes are serialized so rows reach the writer in the order they were added
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                self._flush_fn(rows)
+                self.rows_written += len(rows)
+                self.flushes += 1
+            except Exception as e:
+                logging.error(f"Write-behind flush of {len(rows)} rows failed: {e}")
+            return len(rows)
+
+    def _run(self):
+        while not self._stopped.wait(self._max_delay):
+            self.flush()
+
+    def close(self):
+        """
+        Stop the background flusher and write any remaining rows.
+        """
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DataSource:
+    """
+    Bulk market data access.
+
+    Callers hand over whole symbol/scrip code lists; the source splits them into chunks, retries
+    failed chunks with exponential backoff and records how long every chunk took. Subclasses
+    implement _fetch_history_chunk, _fetch_quotes_chunk and get_scrip_codes.
+    """
+
+    def __init__(self, chunk_size=50, retries=3, backoff=1.0):
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.backoff = backoff
+        # (kind, chunk size, seconds) for the most recent chunks
+        self.chunk_timings = deque(maxlen=1000)
+
+    def fetch_history(self, symbols, start, end, failed=None):
+        """
+        Fetch daily OHLCV bars for many symbols.
+
+        Parameters:
+            symbols (list): Tickers to fetch, e.g. ['RELIANCE.BO', 'TCS.BO'].
+            start (str): First date, 'YYYY-MM-DD'.
+            end (str): Exclusive end date, 'YYYY-MM-DD'.
+            failed (set, optional): Receives the symbols of chunks that still failed after all retries.
+
+        Returns:
+            dict: symbol -> pandas.DataFrame indexed by Date. Symbols without data are left out.
+        """
+        return self._run_chunked('history', list(symbols), lambda chunk: self._fetch_history_chunk(chunk, start, end),
+                                 failed)
+
+    def fetch_quotes(self, codes, failed=None):
+        """
+        Fetch the current BSE quote for many scrip codes.
+
+        Parameters:
+            codes (list): BSE scrip codes.
+            failed (set, optional): Receives the codes of chunks that still failed after all retries.
+
+        Returns:
+            dict: scrip code -> quote dict in the bsedata getQuote format. Failed codes are left out.
+        """
+        return self._run_chunked('quotes', list(codes), self._fetch_quotes_chunk, failed)
+
+    def get_quote(self, code):
+        """
+        Fetch one quote with a single request and no retries, for callers that schedule their own.
+
+        Raises:
+            KeyError: If the source returned no quote for code.
+        """
+        quote = self._fetch_quotes_chunk([code]).get(code)
+        if quote is None:
+            raise KeyError(f"No quote for {code}")
+        return quote
+
+    def get_scrip_codes(self):
+        """
+        Returns a dict of scrip code -> company name for the whole universe.
+        """
+        raise NotImplementedError
+
+    def _fetch_history_chunk(self, symbols, start, end):
+        raise NotImplementedError
+
+    def _fetch_quotes_chunk(self, codes):
+        raise NotImplementedError
+
+    def _run_chunked(self, kind, items, fetch_chunk, failed=None):
+        results = {}
+        for chunk in _chunks(items, self.chunk_size):
+            for attempt in range(self.retries):
+                started = time.perf_counter()
+                try:
+                    results.update(fetch_chunk(chunk))
+                    elapsed = time.perf_counter() - started
+                    self.chunk_timings.append((kind, len(chunk), elapsed))
+                    logger.debug(f"Fetched {kind} chunk of {len(chunk)} in {elapsed:.2f}s")
+                    break
+                except Exception as e:
+                    delay = self.backoff * 2 ** attempt
+                    logger.warning(f"Fetching {kind} chunk of {len(chunk)} failed (attempt {attempt + 1}): {e}")
+                    if attempt + 1 < self.retries:
+                        time.sleep(delay)
+            else:
+                logger.error(f"Giving up on {kind} chunk starting at {chunk[0]}")
+                if failed is not None:
+                    failed.update(chunk)
+        return results
+
+
+class OnlineDataSource(DataSource):
+    """
+    Live data: price history from Yahoo Finance and quotes from BSE through bsedata.
+    Pass bse=FakeBSE(...) to exercise the quote path against a local stand-in.
+    """
+
+    def __init__(self, chunk_size=50, retries=3, backoff=1.0, bse=None):
+        super().__init__(chunk_size, retries, backoff)
+        self._bse = bse
+        self._bse_lock = threading.Lock()
+
+    def _get_bse(self):
+        with self._bse_lock:
+            if self._bse is None:
+                from bsedata.bse import BSE
+                self._bse = BSE()
+            return self._bse
+
+    def get_scrip_codes(self):
+        bse = self._get_bse()
+        bse.updateScripCodes()
+        return bse.getScripCodes()
+
+    def _fetch_history_chunk(self, symbols, start, end):
+        import yfinance as yf
+        frame = yf.download(symbols, start=start, end=end, group_by='ticker', progress=False, threads=True)
+        if frame is None or frame.empty:
+            return {}
+
+        histories = {}
+        for symbol in symbols:
+            if isinstance(frame.columns, pd.MultiIndex):
+                if symbol not in frame.columns.get_level_values(0):
+                    continue
+                history = frame[symbol]
+            else:
+                history = frame
+            history = history.dropna(how='all')
+            if not history.empty:
+                histories[symbol] = history
+        return histories
+
+    def get_quote(self, code):
+        return self._get_bse().getQuote(code)
+
+    def _fetch_quotes_chunk(self, codes):
+        # bsedata has no bulk quote call, so the chunk is fetched code by code on one session
+        bse = self._get_bse()
+        quotes = {}
+        error = None
+        for code in codes:
+            try:
+                quotes[code] = bse.getQuote(code)
+            except Exception as e:
+                error = e
+                logger.debug(f"Downloading failed {code}: {e}")
+        if not quotes and error is not None:
+            raise error
+        return quotes
+
+
+class FileDataSource(DataSource):
+    """
+    Offline data served from a directory, so the pipeline can run and be benchmarked without network.
+
+    Layout:
+        <root>/history/<symbol>.csv   daily bars with a Date column
+        <root>/quotes.json            {scrip code: quote dict in the bsedata format}
+    """
+
+    def __init__(self, root, chunk_size=500, retries=1, backoff=0.0):
+        super().__init__(chunk_size, retries, backoff)
+        self.root = root
+        self._quotes = None
+        self._quotes_mtime = None
+        self._quotes_lock = threading.Lock()
+
+    def _history_path(self, symbol):
+        return os.path.join(self.root, 'history', f'{symbol}.csv')
+
+    def _quotes_path(self):
+        return os.path.join(self.root, 'quotes.json')
+
+    def _load_quotes(self):
+        if not os.path.exists(self._quotes_path()):
+            return {}
+        # Parsed once and reused until the file is rewritten
+        mtime = os.stat(self._quotes_path()).st_mtime_ns
+        with self._quotes_lock:
+            if self._quotes is None or self._quotes_mtime != mtime:
+                with open(self._quotes_path()) as f:
+                    self._quotes = json.load(f)
+                self._quotes_mtime = mtime
+            return self._quotes
+
+    def get_scrip_codes(self):
+        return {code: quote.get('companyName') for code, quote in self._load_quotes().items()}
+
+    def _fetch_history_chunk(self, symbols, start, end):
+        histories = {}
+        for symbol in symbols:
+            path = self._history_path(symbol)
+            if not os.path.exists(path):
+                continue
+            history = pd.read_csv(path, index_col='Date', parse_dates=['Date'])
+            history = history[(history.index >= pd.Timestamp(start)) & (history.index < pd.Timestamp(end))]
+            if not history.empty:
+                histories[symbol] = history
+        return histories
+
+    def _fetch_quotes_chunk(self, codes):
+        quotes = self._load_quotes()
+        return {code: quotes[code] for code in codes if code in quotes}
+
+    def save_history(self, symbol, frame):
+        """
+        Write the bars of one symbol, replacing any stored file.
+        """
+        os.makedirs(os.path.dirname(self._history_path(symbol)), exist_ok=True)
+        frame.to_csv(self._history_path(symbol), index_label='Date')
+
+    def save_quotes(self, quotes):
+        """
+        Write the full {scrip code: quote} mapping.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._quotes_path(), 'w') as f:
+            json.dump(quotes, f)
+
+
+def make_fake_quote(code, index=0, price=100.0):
+    """
+    Build a quote dict shaped like bsedata's getQuote output for offline runs.
+    """
+    security_id = f'FAKE{index}'
+    return {
+        'companyName': f'Fake Company {index}',
+        'currentValue': f'{price:,.2f}',
+        'change': '0.50',
+        'pChange': '0.50',
+        'updatedOn': time.strftime('%d %b %y | %I:%M %p'),
+        'securityID': security_id,
+        'scripCode': str(code),
+        'group': 'A',
+        'faceValue': '10.00',
+        'industry': 'Fake Industry',
+        'previousClose': f'{price - 0.5:.2f}',
+        'previousOpen': f'{price - 1:.2f}',
+        'dayHigh': f'{price + 1:.2f}',
+        'dayLow': f'{price - 1:.2f}',
+        '52weekHigh': f'{price * 1.3:.2f}',
+        '52weekLow': f'{price * 0.7:.2f}',
+        'weightedAvgPrice': f'{price:.2f}',
+        'totalTradedValue': '1,234.56 Cr.',
+        'totalTradedQuantity': '12,34,567',
+        '2WeekAvgQuantity': '10,00,000',
+        'marketCapFull': '12,345.67 Cr.',
+        'marketCapFreeFloat': '6,789.01 Cr.',
+        'buy': {str(level): {'quantity': str(100 * level), 'price': f'{price - 0.05 * level:.2f}'}
+                for level in range(1, 6)},
+        'sell': {str(level): {'quantity': str(100 * level), 'price': f'{price + 0.05 * level:.2f}'}
+                 for level in range(1, 6)},
+    }
+
+
+class FakeBSE:
+    """
+    Local stand-in for bsedata.bse.BSE with injectable latency and failures.
+
+    Parameters:
+        size (int): Number of scrip codes in the fake universe.
+        latency (float): Seconds every getQuote call sleeps.
+        failure_rate (float): Fraction of getQuote calls that raise, chosen at random.
+    """
+
+    def __init__(self, size=4000, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._codes = {str(500000 + index): f'Fake Company {index}' for index in range(size)}
+        self.calls = 0
+
+    def updateScripCodes(self):
+        pass
+
+    def getScripCodes(self):
+        return dict(self._codes)
+
+    def getQuote(self, code):
+        with self._random_lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail or code not in self._codes:
+            raise ConnectionError(f"Fake BSE failed for {code}")
+        index = int(code) - 500000
+        return make_fake_quote(code, index, price=100.0 + index % 900)
+
+
+_data_source = None
+_data_source_lock = threading.Lock()
+
+
+def get_data_source():
+    """
+    Returns the process-wide data source.
+
+    When the STOCK_SENSE_DATA_DIR environment variable is set, data is read from that directory
+    through FileDataSource instead of the network.
+    """
+    global _data_source
+    with _data_source_lock:
+        if _data_source is None:
+            data_dir = os.environ.get('STOCK_SENSE_DATA_DIR')
+            _data_source = FileDataSource(data_dir) if data_dir else OnlineDataSource()
+        return _data_source
+
+
+def set_data_source(source):
+    """
+    Replace the process-wide data source.
+    """
+    global _data_source
+    with _data_source_lock:
+        _data_source = source
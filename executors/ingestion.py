@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from queue import Queue
+
+from dataclass_db.dataclass_db_executor import insert_stock_quotes
+from dataclass_db.write_buffer import WriteBehindBuffer
+from utils.metrics import observe_stage
+
+_DONE = object()
+# Engines of this process, for the queue depth metric
+_engines = weakref.WeakSet()
+
+
+def queue_depth():
+    """
+    Quotes fetched but not yet written, summed over the running ingestion engines.
+    """
+    return sum(engine.queue.qsize() for engine in list(_engines) if engine.queue is not None)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter shared by all fetch threads.
+
+    Parameters:
+        rate (float): Tokens added per second, i.e. the sustained request rate.
+        capacity (int): Maximum burst size.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self._rate = rate
+        self._capacity = capacity if capacity is not None else max(1, int(rate))
+        self._tokens = float(self._capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available and take it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+class _Request:
+    """
+    One quote request on the request pool; started_at is set once a thread picks it up.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at = None
+
+
+class QuoteIngestionEngine:
+    """
+    Fetches quotes for many scrip codes concurrently and streams them to a writer.
+
+    Up to `workers` requests run at once, throttled by a token bucket to `rate` requests per second.
+    Each request is abandoned once it has been running for `timeout` seconds and retried with
+    exponential backoff. Parsed quotes go through a bounded queue to a single writer thread, which
+    collects them in a WriteBehindBuffer that hands them to `sink` every `write_batch_size` quotes or
+    `write_delay_ms` milliseconds; a full queue blocks the fetchers so memory stays bounded when the
+    writer falls behind.
+
+    A running request cannot be interrupted, so an abandoned one keeps its request thread until the
+    call returns. The request pool has `spare_requests` threads beyond `workers` for those; once they
+    are all held by hung calls, a request that does not start within `timeout` is cancelled and
+    counted as saturated instead of queueing behind them.
+
+    The pools and the rate limiter live as long as the engine, so one engine should be kept and
+    reused across runs; close() shuts the pools down.
+
+    Parameters:
+        get_quote (callable): Fetches one quote, e.g. BSE().getQuote or DataSource.get_quote.
+        sink (callable): Receives lists of quotes; defaults to insert_stock_quotes.
+    """
+
+    def __init__(self, get_quote, sink=insert_stock_quotes, workers=8, rate=20.0, timeout=10.0, retries=3,
+                 backoff=0.5, queue_size=1000, write_batch_size=200, write_delay_ms=500, spare_requests=None):
+        self._get_quote = get_quote
+        self._sink = sink
+        self._workers = workers
+        self._bucket = TokenBucket(rate)
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._queue_size = queue_size
+        self._write_batch_size = write_batch_size
+        self._write_delay_ms = write_delay_ms
+        self._spare_requests = workers if spare_requests is None else spare_requests
+        self._stats_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._pools_lock = threading.Lock()
+        self._fetch_pool = None
+        self._request_pool = None
+        self.queue = None
+        self.stats = {}
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def _pools(self):
+        with self._pools_lock:
+            if self._fetch_pool is None:
+                self._fetch_pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='quote-fetch')
+                # Requests run on their own pool so a hung call can be abandoned without blocking its fetcher
+                self._request_pool = ThreadPoolExecutor(max_workers=self._workers + self._spare_requests,
+                                                        thread_name_prefix='quote-request')
+            return self._fetch_pool, self._request_pool
+
+    def _call(self, request, code):
+        request.started_at = time.perf_counter()
+        request.started.set()
+        return self._get_quote(code)
+
+    def _request(self, request_pool, code):
+        """
+        Run one request and wait for it, counting the timeout from when it starts running.
+
+        Raises:
+            concurrent.futures.TimeoutError: When the request ran for longer than the timeout, or
+                could not start within it because every request thread is held by a hung call.
+        """
+        request = _Request()
+        future = request_pool.submit(self._call, request, code)
+        if not request.started.wait(self._timeout) and future.cancel():
+            self._count('saturated')
+            logging.warning(f"Quote request for {code} did not start within {self._timeout}s, "
+                            f"all request threads are busy")
+            raise FutureTimeoutError()
+        request.started.wait()
+        try:
+            return future.result(timeout=max(0.0, self._timeout - (time.perf_counter() - request.started_at)))
+        except FutureTimeoutError:
+            self._count('abandoned')
+            raise
+
+    def _fetch(self, request_pool, code):
+        for attempt in range(self._retries):
+            self._bucket.acquire()
+            self._count('requests')
+            started = time.perf_counter()
+            try:
+                quote = self._request(request_pool, code)
+                observe_stage('fetch_quote', time.perf_counter() - started)
+                self.queue.put(quote)
+                self._count('fetched')
+                return
+            except FutureTimeoutError:
+                observe_stage('fetch_quote', time.perf_counter() - started, failed=True)
+                self._count('timeouts')
+                logging.debug(f"Quote request for {code} timed out after {self._timeout}s")
+            except Exception as e:
+                observe_stage('fetch_quote', time.perf_counter() - started, failed=True)
+                logging.debug(f"Downloading failed {code}: {e}")
+            if attempt + 1 < self._retries:
+                self._count('retries')
+                time.sleep(self._backoff * 2 ** attempt)
+        self._count('failed')
+
+    def _write(self, sink):
+        with WriteBehindBuffer(sink, max_rows=self._write_batch_size, max_delay_ms=self._write_delay_ms) as buffer:
+            while True:
+                item = self.queue.get()
+                if item is _DONE:
+                    break
+                buffer.add(item)
+        self._count('written', buffer.rows_written)
+
+    def run(self, codes, sink=None):
+        """
+        Fetch the quotes of all codes and hand them to the sink.
+
+        Parameters:
+            codes (iterable): BSE scrip codes.
+            sink (callable, optional): Overrides the engine's sink for this run.
+
+        Returns:
+            dict: Counters (requests, fetched, failed, retries, timeouts, written), elapsed seconds
+                  and quotes per second.
+        """
+        codes = list(codes)
+        fetch_pool, request_pool = self._pools()
+        # Runs share the engine's pools and rate limiter but not their queue and counters
+        with self._run_lock:
+            self.stats = {}
+            self.queue = Queue(maxsize=self._queue_size)
+            _engines.add(self)
+            started = time.perf_counter()
+            writer = threading.Thread(target=self._write, args=(sink or self._sink,), daemon=True)
+            writer.start()
+            try:
+                wait([fetch_pool.submit(self._fetch, request_pool, code) for code in codes])
+            finally:
+                self.queue.put(_DONE)
+                writer.join()
+                _engines.discard(self)
+
+            elapsed = time.perf_counter() - started
+            stats = dict(self.stats, elapsed=elapsed, quotes_per_second=self.stats.get('fetched', 0) / elapsed if elapsed else 0.0)
+            logging.info(f"Ingested {stats.get('written', 0)}/{len(codes)} quotes in {elapsed:.1f}s "
+                         f"({stats['quotes_per_second']:.1f} quotes/s, {stats.get('failed', 0)} failed)")
+            return stats
+
+    def fetch_quotes(self, codes):
+        """
+        Fetch quotes concurrently and return them instead of writing them.
+
+        Returns:
+            dict: scrip code -> quote for every code that succeeded.
+        """
+        collected = []
+        self.run(codes, sink=collected.extend)
+        return {quote.get('scripCode'): quote for quote in collected}
+
+    def close(self):
+        """
+        Shut down the engine's pools. Requests still hung in a call are left to finish on their own.
+        """
+        with self._pools_lock:
+            if self._fetch_pool is not None:
+                self._fetch_pool.shutdown(wait=True)
+                self._request_pool.shutdown(wait=False, cancel_futures=True)
+                self._fetch_pool = self._request_pool = None
@@ -0,0 +1,300 @@
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from queue import Empty, Queue
+
+from dataclass_db.dataclass_db_executor import iter_quote_columns, upsert_predictions
+from dataclass_db.stock_predictions import Prediction
+from executors.executor import data_retriever_executor
+from model.keras_model import load_history, prepare_training_data_many, train_and_predict
+from model.registry import get_model_registry
+from model.training_pool import TrainingPool
+from utils.metrics import observe_stage
+
+_STOP = object()
+# The only quote fields a prediction run needs; read as columns instead of whole StockQuote rows
+PIPELINE_COLUMNS = ('security_id', 'company_name', 'current_value')
+
+
+class Job:
+    """
+    State and progress of one prediction run, readable while the pipeline is still working.
+    """
+
+    def __init__(self, stages):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.queued = 0
+        self.queues = {}
+        self.stages = {name: {'processed': 0, 'failed': 0, 'seconds': 0.0} for name in stages}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, failed=False):
+        observe_stage(f'pipeline_{stage}', seconds, failed)
+        with self._lock:
+            counters = self.stages[stage]
+            counters['failed' if failed else 'processed'] += 1
+            counters['seconds'] += seconds
+
+    def to_dict(self):
+        with self._lock:
+            stages = {name: dict(counters) for name, counters in self.stages.items()}
+        end = self.finished_at or datetime.now()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0.0
+        written = stages['write']['processed']
+        for name, counters in stages.items():
+            counters['queue_depth'] = self.queues[name].qsize() if name in self.queues else 0
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None,
+            'symbols_queued': self.queued,
+            'symbols_written': written,
+            'elapsed_seconds': round(elapsed, 3),
+            'symbols_per_second': round(written / elapsed, 3) if elapsed else 0.0,
+            'stages': stages,
+        }
+
+
+class PredictionPipeline:
+    """
+    Producer/consumer pipeline fetch -> features -> predict -> write over bounded queues.
+
+    Every stage runs on its own pool of worker threads and reads from a bounded queue, so a slow
+    stage throttles the ones in front of it instead of letting work pile up in memory. A symbol
+    that fails in any stage is counted and dropped; the rest of the run continues. The features
+    stage takes up to feature_batch_size waiting symbols at once and computes them as one panel.
+    """
+
+    STAGES = ('fetch', 'features', 'predict', 'write')
+
+    def __init__(self, training_pool=None, fetch_workers=4, feature_workers=2, predict_workers=None, queue_size=32,
+                 write_batch_size=50, feature_batch_size=32):
+        self._training_pool = training_pool
+        if predict_workers is None:
+            # One thread per training process keeps every worker busy
+            predict_workers = training_pool.workers if training_pool is not None else 2
+        self._workers = {'fetch': fetch_workers, 'features': feature_workers, 'predict': predict_workers, 'write': 1}
+        self._queue_size = queue_size
+        self._write_batch_size = write_batch_size
+        self._batch_sizes = {'fetch': 1, 'features': feature_batch_size, 'predict': 1}
+
+    def _fetch(self, item):
+        item['symbol'] = item['security_id'] + '.BO'  # Assuming it's a BSE stock
+        item['stock'] = load_history(item['symbol'])
+        return item
+
+    def _features(self, items):
+        training_data = prepare_training_data_many({item['symbol']: item.pop('stock') for item in items})
+        for item in items:
+            item['training_data'] = training_data[item['symbol']]
+        return items
+
+    def _predict(self, item):
+        data, dates = item.pop('training_data')
+        if self._training_pool is not None:
+            item['predicted_price'] = self._training_pool.train_and_predict(item['symbol'], data, dates)
+        else:
+            item['predicted_price'] = train_and_predict(data, dates, symbol=item['symbol'],
+                                                        registry=get_model_registry())
+        return item
+
+    def _worker(self, job, stage, fn, in_queue, out_queue, remaining, batch_size):
+        stopped = False
+        while not stopped:
+            items = [in_queue.get()]
+            # Items that are already waiting join the batch, up to batch_size
+            while len(items) < batch_size and items[-1] is not _STOP:
+                try:
+                    items.append(in_queue.get_nowait())
+                except Empty:
+                    break
+            if items[-1] is _STOP:
+                stopped = True
+                items.pop()
+            if not items:
+                continue
+            started = time.perf_counter()
+            try:
+                results = fn(items)
+                per_item = (time.perf_counter() - started) / len(items)
+                for result in results:
+                    job.record(stage, per_item)
+                    out_queue.put(result)
+            except Exception as e:
+                per_item = (time.perf_counter() - started) / len(items)
+                for _ in items:
+                    job.record(stage, per_item, failed=True)
+                logging.error(f"{stage} failed for {', '.join(item['security_id'] for item in items)}: {e}")
+        # The last worker of a stage to finish tells every worker of the next stage to stop
+        with remaining['lock']:
+            remaining['count'] -= 1
+            last = remaining['count'] == 0
+        if last:
+            for _ in range(remaining['next_workers']):
+                out_queue.put(_STOP)
+
+    def _writer(self, job, in_queue):
+        batch = []
+
+        def flush():
+            started = time.perf_counter()
+            try:
+                upsert_predictions([item['prediction'] for item in batch], table='predictions')
+                per_item = (time.perf_counter() - started) / len(batch)
+                for _ in batch:
+                    job.record('write', per_item)
+            except Exception as e:
+                logging.error(f"Writing {len(batch)} predictions failed: {e}")
+                for _ in batch:
+                    job.record('write', 0.0, failed=True)
+            batch.clear()
+
+        while True:
+            item = in_queue.get()
+            if item is _STOP:
+                break
+            try:
+                item['prediction'] = Prediction(item['company_name'], item['security_id'],
+                                                float(item['current_value']), float(item['predicted_price']),
+                                                datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            except Exception as e:
+                # Like the other stages: count the symbol as failed and keep draining the queue, so the
+                # predict workers never block on a full write queue
+                job.record('write', 0.0, failed=True)
+                logging.error(f"write failed for {item.get('security_id')}: {e}")
+                continue
+            batch.append(item)
+            if len(batch) >= self._write_batch_size:
+                flush()
+        if batch:
+            flush()
+
+    def run(self, job, quote_columns):
+        """
+        Push every quote through the pipeline and block until the last prediction is written.
+
+        Parameters:
+            job (Job): Receives the progress of the run.
+            quote_columns (iterable): Column chunks of the quotes to predict, as yielded by
+                iter_quote_columns, with at least PIPELINE_COLUMNS.
+        """
+        queues = {stage: Queue(maxsize=self._queue_size) for stage in self.STAGES}
+        job.queues = queues
+        functions = {'fetch': lambda items: [self._fetch(item) for item in items], 'features': self._features,
+                     'predict': lambda items: [self._predict(item) for item in items]}
+        threads = []
+        for index, stage in enumerate(self.STAGES[:-1]):
+            next_stage = self.STAGES[index + 1]
+            remaining = {'count': self._workers[stage], 'next_workers': self._workers[next_stage],
+                         'lock': threading.Lock()}
+            for _ in range(self._workers[stage]):
+                threads.append(threading.Thread(
+                    target=self._worker, daemon=True,
+                    args=(job, stage, functions[stage], queues[stage], queues[next_stage], remaining,
+                          self._batch_sizes[stage])))
+        threads.append(threading.Thread(target=self._writer, args=(job, queues['write']), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        for columns in quote_columns:
+            for security_id, company_name, current_value in zip(*(columns[name] for name in PIPELINE_COLUMNS)):
+                # NULL current_value arrives as NaN from the float64 column; no prediction can be written for it
+                if not security_id or math.isnan(current_value):
+                    continue
+                queues['fetch'].put({'security_id': security_id, 'company_name': company_name,
+                                     'current_value': current_value})
+                job.queued += 1
+        for _ in range(self._workers['fetch']):
+            queues['fetch'].put(_STOP)
+
+        for thread in threads:
+            thread.join()
+
+
+class JobManager:
+    """
+    Runs prediction jobs in the background and keeps the most recent ones for status queries.
+    """
+
+    def __init__(self, pipeline=None, max_jobs=100):
+        self._pipeline = pipeline
+        self._max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_pipeline(self):
+        # The training pool starts its worker processes, so it is only created once a job needs it
+        with self._lock:
+            if self._pipeline is None:
+                self._pipeline = PredictionPipeline(training_pool=TrainingPool())
+            return self._pipeline
+
+    def submit(self, refresh_quotes=True):
+        """
+        Start a prediction run over all stored quotes and return its Job immediately.
+
+        Parameters:
+            refresh_quotes (bool): Download fresh quotes from BSE once before predicting.
+        """
+        pipeline = self._get_pipeline()
+        job = Job(PredictionPipeline.STAGES)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self._max_jobs:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, pipeline, refresh_quotes), daemon=True).start()
+        return job
+
+    def _run(self, job, pipeline, refresh_quotes):
+        job.status = 'running'
+        job.started_at = datetime.now()
+        try:
+            if refresh_quotes:
+                data_retriever_executor()
+            pipeline.run(job, iter_quote_columns(columns=PIPELINE_COLUMNS))
+            job.status = 'completed'
+        except Exception as e:
+            logging.error(f"Prediction job {job.id} failed", exc_info=True)
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_depths(self):
+        """
+        Items waiting in each pipeline stage queue, summed over the running jobs.
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.status == 'running']
+        depths = {stage: 0 for stage in PredictionPipeline.STAGES}
+        for job in jobs:
+            for stage, queue in job.queues.items():
+                depths[stage] += queue.qsize()
+        return depths
+
+    def status_counts(self):
+        """
+        Number of retained jobs per status.
+        """
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {status: statuses.count(status) for status in ('queued', 'running', 'completed', 'failed')}
+
+
+job_manager = JobManager()
@@ -0,0 +1,182 @@
+import logging
+import math
+import os
+import socket
+import threading
+import time
+
+from utils.db import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+def default_owner():
+    """
+    Worker identity used in work_leases: STOCK_SENSE_WORKER_ID, or host name and process ID.
+    """
+    return os.environ.get('STOCK_SENSE_WORKER_ID') or f'{socket.gethostname()}:{os.getpid()}'
+
+
+class WorkLeases:
+    """
+    Splits the scrip codes in work_leases between scheduler processes through time-limited leases.
+
+    Every call to rebalance() heartbeats this worker in work_owners, renews its leases and, in the
+    same write transaction, claims unowned or expired codes up to a fair share of the universe
+    (codes / live workers), or hands back codes above it when other workers have joined. A worker
+    that crashes stops renewing, its leases expire, and the survivors pick its codes up on their
+    next rebalance. Lease times are wall-clock seconds, so workers on different hosts sharing the
+    database need reasonably synchronised clocks.
+
+    Work on a code can outlast a lease, so start_heartbeat() renews the leases from a background
+    thread every lease_seconds / 3, and held() tells which codes are still safe to work on.
+
+    Parameters:
+        owner (str, optional): Worker identity. Defaults to default_owner().
+        lease_seconds (float): How long a claim stays valid without renewal.
+    """
+
+    def __init__(self, owner=None, lease_seconds=180.0):
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self._held = set()
+        self._held_until = 0.0
+        self._held_lock = threading.Lock()
+        self._heartbeat = None
+        self._stopped = threading.Event()
+
+    def sync_universe(self, codes):
+        """
+        Make work_leases hold exactly codes: new codes are added unowned, delisted ones removed.
+        """
+        codes = [str(code) for code in codes]
+        with get_db_pool().connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS universe (scrip_code TEXT PRIMARY KEY)')
+            conn.execute('DELETE FROM universe')
+            conn.executemany('INSERT OR IGNORE INTO universe (scrip_code) VALUES (?)', ((code,) for code in codes))
+            conn.execute('INSERT OR IGNORE INTO work_leases (scrip_code) SELECT scrip_code FROM universe')
+            conn.execute('DELETE FROM work_leases WHERE scrip_code NOT IN (SELECT scrip_code FROM universe)')
+            conn.commit()
+
+    def rebalance(self):
+        """
+        Renew this worker's leases and claim or release codes towards its fair share.
+
+        Returns:
+            list: The scrip codes this worker owns until its next rebalance.
+        """
+        now = time.time()
+        expires = now + self.lease_seconds
+        with get_db_pool().connection() as conn:
+            # IMMEDIATE takes the write lock up front, so two workers never claim the same codes
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                INSERT INTO work_owners (owner, heartbeat) VALUES (?, ?)
+                ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat
+            ''', (self.owner, now))
+            conn.execute('DELETE FROM work_owners WHERE heartbeat < ?', (now - self.lease_seconds,))
+            conn.execute('UPDATE work_leases SET lease_expires = ?, heartbeat = ? WHERE owner = ?',
+                         (expires, now, self.owner))
+            total = conn.execute('SELECT COUNT(*) FROM work_leases').fetchone()[0]
+            workers = conn.execute('SELECT COUNT(*) FROM work_owners').fetchone()[0]
+            owned = conn.execute('SELECT COUNT(*) FROM work_leases WHERE owner = ?', (self.owner,)).fetchone()[0]
+            share = math.ceil(total / workers)
+
+            if owned < share:
+                conn.execute('''
+                    UPDATE work_leases SET owner = ?, lease_expires = ?, heartbeat = ?
+                    WHERE scrip_code IN (
+                        SELECT scrip_code FROM work_leases
+                        WHERE owner IS NULL OR lease_expires < ?
+                        ORDER BY lease_expires LIMIT ?
+                    )
+                ''', (self.owner, expires, now, now, share - owned))
+            elif owned > share:
+                conn.execute('''
+                    UPDATE work_leases SET owner = NULL, lease_expires = 0, heartbeat = NULL
+                    WHERE scrip_code IN (SELECT scrip_code FROM work_leases WHERE owner = ? LIMIT ?)
+                ''', (self.owner, owned - share))
+
+            codes = [row[0] for row in conn.execute('SELECT scrip_code FROM work_leases WHERE owner = ?',
+                                                    (self.owner,))]
+            conn.commit()
+        self._set_held(codes, expires)
+
+        logger.info(f"Worker {self.owner} holds {len(codes)} of {total} codes ({workers} live workers)")
+        return codes
+
+    def renew(self):
+        """
+        Heartbeat this worker and extend the leases it still holds, without claiming or releasing any.
+
+        Returns:
+            list: The scrip codes this worker holds.
+        """
+        now = time.time()
+        expires = now + self.lease_seconds
+        with get_db_pool().connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('''
+                INSERT INTO work_owners (owner, heartbeat) VALUES (?, ?)
+                ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat
+            ''', (self.owner, now))
+            conn.execute('UPDATE work_leases SET lease_expires = ?, heartbeat = ? WHERE owner = ?',
+                         (expires, now, self.owner))
+            codes = [row[0] for row in conn.execute('SELECT scrip_code FROM work_leases WHERE owner = ?',
+                                                    (self.owner,))]
+            conn.commit()
+        self._set_held(codes, expires)
+        return codes
+
+    def _set_held(self, codes, expires):
+        with self._held_lock:
+            self._held = set(codes)
+            self._held_until = expires
+
+    def held(self, codes):
+        """
+        The codes among codes whose lease this worker held at its last renewal, as long as that lease
+        has not run out since. Codes another worker may have taken over are left out.
+        """
+        with self._held_lock:
+            if time.time() >= self._held_until:
+                return []
+            return [code for code in codes if str(code) in self._held]
+
+    def start_heartbeat(self, interval=None):
+        """
+        Renew the leases from a daemon thread every interval seconds (lease_seconds / 3 by default)
+        until release(). Does nothing when the heartbeat is already running.
+        """
+        interval = interval or self.lease_seconds / 3
+        with self._held_lock:
+            if self._heartbeat is not None:
+                return
+            self._stopped.clear()
+            self._heartbeat = threading.Thread(target=self._run_heartbeat, args=(interval,), daemon=True,
+                                               name='work-leases-heartbeat')
+            self._heartbeat.start()
+
+    def _run_heartbeat(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.renew()
+            except Exception as e:
+                logger.error(f"Renewing the leases of {self.owner} failed: {e}")
+
+    def release(self):
+        """
+        Give up every lease of this worker so the others can take its codes over immediately.
+        """
+        with self._held_lock:
+            heartbeat, self._heartbeat = self._heartbeat, None
+        if heartbeat is not None:
+            self._stopped.set()
+            heartbeat.join()
+        self._set_held((), 0.0)
+        with get_db_pool().connection() as conn:
+            conn.execute('UPDATE work_leases SET owner = NULL, lease_expires = 0, heartbeat = NULL WHERE owner = ?',
+                         (self.owner,))
+            conn.execute('DELETE FROM work_owners WHERE owner = ?', (self.owner,))
+            conn.commit()
@@ -0,0 +1,171 @@
+import heapq
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalScheduler:
+    """
+    Spreads the prediction universe across scheduler ticks and only re-predicts what changed.
+
+    Every symbol sits in a priority queue ordered by the time it is next due. A tick pops due symbols
+    batch_size at a time and hands them to process_batch until its time budget is spent; whatever is
+    still due waits for the next tick. process_batch checks with has_changed() whether a symbol's
+    quote or price history moved since the fingerprint record()ed at its last prediction. Symbols
+    that keep changing are re-checked every min_interval, quiet ones back off towards max_interval.
+
+    Parameters:
+        get_codes (callable): Returns the scrip codes of the universe.
+        process_batch (callable): Takes a list of codes and returns a dict code -> outcome, where
+            outcome is True (predicted), False (unchanged, skipped) or None (inactive). Codes
+            missing from the result failed and are retried after min_interval.
+        budget (float): Seconds a tick may spend processing batches.
+        batch_size (int): Codes handed to process_batch at a time.
+        min_interval (float): Seconds before a changed or failed symbol is checked again.
+        max_interval (float): Longest back-off for unchanged and inactive symbols.
+        universe_refresh (float): Seconds between get_codes calls.
+    """
+
+    def __init__(self, get_codes, process_batch, budget=45.0, batch_size=256, min_interval=60.0,
+                 max_interval=3600.0, universe_refresh=3600.0):
+        self.get_codes = get_codes
+        self.process_batch = process_batch
+        self.budget = budget
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.universe_refresh = universe_refresh
+        self._queue = []
+        # Codes with an entry in _queue; a code never gets a second one, so a tick cannot pop it twice
+        self._queued = set()
+        self._universe = set()
+        self._intervals = {}
+        self._fingerprints = {}
+        self._universe_loaded_at = None
+        self._running = threading.Lock()
+        self.ticks = 0
+        self.skipped_ticks = 0
+        self.last_stats = None
+
+    @property
+    def queue_size(self):
+        return len(self._queue)
+
+    def has_changed(self, code, fingerprint):
+        """
+        Whether fingerprint (e.g. the quote's updatedOn and the last price bar) differs from the one
+        recorded when code was last predicted.
+        """
+        return self._fingerprints.get(code) != fingerprint
+
+    def record(self, code, fingerprint):
+        """
+        Remember the fingerprint code was predicted at; call it once the prediction is stored.
+        """
+        self._fingerprints[code] = fingerprint
+
+    def _refresh_universe(self, now):
+        codes = set(self.get_codes())
+        for code in codes - self._queued:
+            heapq.heappush(self._queue, (now, code))
+            self._queued.add(code)
+            self._intervals[code] = self.min_interval
+        # Codes that left the universe are dropped lazily when they reach the front of the queue; one
+        # that comes back before then keeps its entry
+        self._universe = codes
+        self._universe_loaded_at = now
+
+    def _reschedule(self, code, outcome, now):
+        if outcome is None:
+            interval = self.max_interval
+        elif outcome:
+            interval = self.min_interval
+        else:
+            interval = min(self.max_interval, self._intervals.get(code, self.min_interval) * 2)
+        self._intervals[code] = interval
+        heapq.heappush(self._queue, (now + interval, code))
+        self._queued.add(code)
+
+    def _pop_due(self, cutoff, now):
+        batch, lags = [], []
+        while self._queue and len(batch) < self.batch_size and self._queue[0][0] <= cutoff:
+            due, code = heapq.heappop(self._queue)
+            self._queued.discard(code)
+            if code not in self._universe:
+                self._intervals.pop(code, None)
+                self._fingerprints.pop(code, None)
+                continue
+            batch.append(code)
+            lags.append(now - due)
+        return batch, lags
+
+    def tick(self):
+        """
+        Run one scheduler tick. Returns immediately if the previous tick is still running.
+
+        Returns:
+            dict or None: Tick statistics, or None when the tick was skipped.
+        """
+        if not self._running.acquire(blocking=False):
+            self.skipped_ticks += 1
+            logger.warning("Previous scheduler tick is still running; skipping this one")
+            return None
+        try:
+            return self._tick()
+        finally:
+            self._running.release()
+
+    def _tick(self):
+        started = time.monotonic()
+        if self._universe_loaded_at is None or started - self._universe_loaded_at >= self.universe_refresh:
+            try:
+                self._refresh_universe(started)
+            except Exception as e:
+                # An escaping error would end the scheduler thread; work through the last universe instead
+                logger.error(f"Refreshing the scheduler universe failed, keeping the previous one: {e}")
+
+        stats = {'checked': 0, 'predicted': 0, 'unchanged': 0, 'inactive': 0, 'failed': 0, 'max_lag': 0.0}
+        lag_total = 0.0
+        while time.monotonic() - started < self.budget:
+            # Only symbols due when the tick started, so a tick never processes a symbol twice
+            batch, lags = self._pop_due(started, time.monotonic())
+            if not batch:
+                break
+            try:
+                outcomes = self.process_batch(batch)
+            except Exception as e:
+                logger.error(f"Scheduler batch of {len(batch)} codes failed: {e}")
+                outcomes = {}
+            now = time.monotonic()
+            for code in batch:
+                if code not in outcomes:
+                    stats['failed'] += 1
+                    self._reschedule(code, True, now)
+                    continue
+                outcome = outcomes[code]
+                self._reschedule(code, outcome, now)
+                if outcome is None:
+                    stats['inactive'] += 1
+                elif outcome:
+                    stats['predicted'] += 1
+                else:
+                    stats['unchanged'] += 1
+            stats['checked'] += len(batch)
+            stats['max_lag'] = max(stats['max_lag'], max(lags))
+            lag_total += sum(lags)
+
+        now = time.monotonic()
+        self.ticks += 1
+        stats['mean_lag'] = round(lag_total / stats['checked'], 3) if stats['checked'] else 0.0
+        stats['max_lag'] = round(stats['max_lag'], 3)
+        stats['backlog'] = sum(1 for due, code in self._queue if due <= now and code in self._universe)
+        stats['elapsed'] = round(now - started, 3)
+        stats['symbols_per_second'] = round(stats['checked'] / (now - started), 3) if now > started else 0.0
+        logger.info(f"Scheduler tick {self.ticks}: checked {stats['checked']}, predicted {stats['predicted']}, "
+                    f"unchanged {stats['unchanged']}, inactive {stats['inactive']}, failed {stats['failed']}, "
+                    f"backlog {stats['backlog']}, lag mean {stats['mean_lag']}s max {stats['max_lag']}s, "
+                    f"took {stats['elapsed']}s ({stats['symbols_per_second']} symbols/s)")
+        self.last_stats = stats
+        return stats
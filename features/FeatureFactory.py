@@ -1,8 +1,15 @@
+import numpy as np
+
+from features.PanelFeatures import compute_panel_features
+from utils.metrics import timed
+
+
+@timed('create_features')
 def create_features(data):
-    data['SMA_20'] = data['Close'].rolling(window=20).mean()
-    data['SMA_50'] = data['Close'].rolling(window=50).mean()
-    data['EMA_20'] = data['Close'].ewm(span=20, adjust=False).mean()
-    data['EMA_50'] = data['Close'].ewm(span=50, adjust=False).mean()
-    data['Volume_Mean'] = data['Volume'].rolling(window=20).mean()
+    # A single-symbol view over the panel engine: the one column of a (dates, 1) panel
+    close = np.asarray(data['Close'], dtype=np.float64).reshape(len(data), -1)[:, :1]
+    volume = np.asarray(data['Volume'], dtype=np.float64).reshape(len(data), -1)[:, :1]
+    for name, values in compute_panel_features(close, volume).items():
+        data[name] = values[:, 0]
     data.dropna(inplace=True)
-    return data
\ No newline at end of file
+    return data
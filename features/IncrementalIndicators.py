@@ -0,0 +1,365 @@
+import json
+import math
+import sqlite3
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from features.PanelFeatures import build_panel, compute_panel_features
+from utils.price_history import HISTORY_DB_PATH
+
+FEATURE_NAMES = ['SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'Volume_Mean']
+# Bumped whenever what indicator_state holds changes; states of another version are rebuilt
+STATE_VERSION = 2
+# Running sums are recomputed from the window this often to stop floating point drift
+_RESUM_EVERY = 1000
+
+
+class RollingMean:
+    """
+    Mean of the last `window` values, updated in O(1) from a ring buffer and a running sum.
+    """
+
+    def __init__(self, window, values=()):
+        self.window = window
+        self.values = deque(values, maxlen=window)
+        self.total = math.fsum(self.values)
+        self._updates = 0
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(value)
+        self.total += value
+        self._updates += 1
+        if self._updates % _RESUM_EVERY == 0:
+            self.total = math.fsum(self.values)
+
+    @property
+    def value(self):
+        if len(self.values) < self.window:
+            return None
+        return self.total / self.window
+
+
+class Ema:
+    """
+    Exponential moving average matching pandas ewm(span=span, adjust=False).
+    """
+
+    def __init__(self, span, value=None):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.value = value
+
+    def push(self, x):
+        self.value = x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+
+
+class IndicatorState:
+    """
+    Rolling state of every indicator in create_features for one symbol.
+
+    update() consumes one bar and returns its features, or None while the 50-bar warm-up lasts
+    (the rows create_features drops with dropna).
+    """
+
+    def __init__(self):
+        self.sma_20 = RollingMean(20)
+        self.sma_50 = RollingMean(50)
+        self.ema_20 = Ema(20)
+        self.ema_50 = Ema(50)
+        self.volume_mean = RollingMean(20)
+        self.first_date = None
+        self.last_date = None
+
+    def update(self, date, close, volume):
+        if self.first_date is None:
+            self.first_date = date
+        self.last_date = date
+        self.sma_20.push(close)
+        self.sma_50.push(close)
+        self.ema_20.push(close)
+        self.ema_50.push(close)
+        self.volume_mean.push(volume)
+        features = [self.sma_20.value, self.sma_50.value, self.ema_20.value, self.ema_50.value, self.volume_mean.value]
+        if any(value is None for value in features):
+            return None
+        return dict(zip(FEATURE_NAMES, features))
+
+    def to_json(self):
+        return json.dumps({
+            'version': STATE_VERSION,
+            'closes': list(self.sma_50.values),
+            'volumes': list(self.volume_mean.values),
+            'ema_20': self.ema_20.value,
+            'ema_50': self.ema_50.value,
+            'first_date': self.first_date,
+            'last_date': self.last_date,
+        })
+
+    @classmethod
+    def from_history(cls, dates, closes, volumes, ema_20, ema_50):
+        """
+        State after the given bars, whose EMAs the caller has already computed.
+        """
+        state = cls()
+        state.sma_20 = RollingMean(20, closes[-20:])
+        state.sma_50 = RollingMean(50, closes[-50:])
+        state.volume_mean = RollingMean(20, volumes[-20:])
+        state.ema_20 = Ema(20, ema_20)
+        state.ema_50 = Ema(50, ema_50)
+        if dates:
+            state.first_date = dates[0]
+            state.last_date = dates[-1]
+        return state
+
+    @classmethod
+    def from_json(cls, text):
+        stored = json.loads(text)
+        state = cls()
+        state.sma_20 = RollingMean(20, stored['closes'][-20:])
+        state.sma_50 = RollingMean(50, stored['closes'])
+        state.volume_mean = RollingMean(20, stored['volumes'])
+        state.ema_20 = Ema(20, stored['ema_20'])
+        state.ema_50 = Ema(50, stored['ema_50'])
+        state.first_date = stored['first_date']
+        state.last_date = stored['last_date']
+        return state
+
+
+class IncrementalFeatureStore:
+    """
+    Persists indicator state and computed feature rows per symbol, so each run only processes the
+    bars added since the previous one.
+
+    features(symbol, stock) returns the same frame as create_features(stock), i.e. the pandas
+    rolling/ewm indicators (within floating point tolerance), while doing O(1) work per new bar,
+    plus the latest bar again since its values may have been revised. A bar with a missing Close
+    or Volume is a gap, as in create_features: the windows it falls in produce no rows and the EMAs
+    decay across it. The running state cannot hold gaps, so a frame with any is recomputed in full
+    on every update. features_many() does the same for a batch of symbols and computes the ones
+    that need a full rebuild as one panel.
+    """
+
+    def __init__(self, db_path=HISTORY_DB_PATH):
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS indicator_state (
+                    symbol TEXT PRIMARY KEY,
+                    state TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS feature_history (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    sma_20 REAL,
+                    sma_50 REAL,
+                    ema_20 REAL,
+                    ema_50 REAL,
+                    volume_mean REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _load_state(self, conn, symbol):
+        row = conn.execute('SELECT state FROM indicator_state WHERE symbol = ?', (symbol,)).fetchone()
+        if row is None or json.loads(row[0]).get('version') != STATE_VERSION:
+            return None
+        return IndicatorState.from_json(row[0])
+
+    @staticmethod
+    def _replay(symbol, state, dates, bars):
+        """
+        Feed the bars after the state's last date through it, one at a time.
+
+        Returns:
+            tuple: (feature rows, state to store), or None when there is nothing to apply.
+        """
+        pending = [(date, float(close), float(volume))
+                   for date, close, volume in zip(dates, bars['Close'].values, bars['Volume'].values)
+                   if state.last_date is None or date > state.last_date]
+        if not pending:
+            return None
+        rows = []
+        for index, (date, close, volume) in enumerate(pending):
+            if index == len(pending) - 1:
+                stored_state = state.to_json()
+            features = state.update(date, close, volume)
+            if features is not None:
+                rows.append((symbol, date, *(features[name] for name in FEATURE_NAMES)))
+        return rows, stored_state
+
+    @staticmethod
+    def _rebuild(histories):
+        """
+        Compute the full feature history of many symbols in one panel pass.
+
+        Parameters:
+            histories (dict): symbol -> (dates, bars) of the symbols to rebuild. Bars may hold NaN
+                gaps, which are masked out like compute_panel_features does.
+
+        Returns:
+            tuple: (feature rows, [(symbol, state to store)]). Symbols with gaps get no state, so
+                their next update rebuilds them again.
+        """
+        symbols, close, volume, mask = build_panel({symbol: bars for symbol, (_, bars) in histories.items()})
+        panel = compute_panel_features(close, volume, mask)
+        stacked = np.stack([panel[name] for name in FEATURE_NAMES], axis=-1)
+        rows, states = [], []
+        for column, symbol in enumerate(symbols):
+            dates, bars = histories[symbol]
+            block = stacked[len(stacked) - len(dates):, column]
+            complete = ~np.isnan(block).any(axis=1)
+            rows.extend((symbol, date, *values) for date, values, keep in zip(dates, block.tolist(), complete) if keep)
+            if bars.isna().to_numpy().any():
+                continue
+            # Stored as of the bar before the latest, like _replay does
+            emas = (panel['EMA_20'][-2, column], panel['EMA_50'][-2, column]) if len(dates) > 1 else (None, None)
+            state = IndicatorState.from_history(dates[:-1], bars['Close'].values[:-1].tolist(),
+                                                bars['Volume'].values[:-1].tolist(),
+                                                *(None if value is None else float(value) for value in emas))
+            states.append((symbol, state.to_json()))
+        return rows, states
+
+    def update(self, symbol, stock):
+        """
+        Feed the bars of stock that are newer than the stored state through the indicators.
+
+        Returns:
+            int: Number of feature rows written.
+        """
+        return self.update_many({symbol: stock})
+
+    def update_many(self, stocks):
+        """
+        Bring the stored features of many symbols up to date with their price frames.
+
+        The stored state is the one as of the bar before the latest, because the price history
+        store re-fetches the latest bar and overwrites it when it was partial. Every update applies
+        that bar again, with whatever values stock has for it now, on top of the stored state.
+
+        A symbol without a stored state, whose frame starts on a different date than it (every
+        indicator depends on where the history begins), or whose frame has bars without a Close or
+        Volume, is rebuilt from scratch. All rebuilds of one call are computed together as a single
+        panel.
+
+        Parameters:
+            stocks (dict): symbol -> price DataFrame with Close and Volume columns.
+
+        Returns:
+            int: Number of feature rows written.
+        """
+        histories, gapped = {}, set()
+        for symbol, stock in stocks.items():
+            bars = stock[['Close', 'Volume']]
+            present = bars.notna().to_numpy()
+            if not present.all(axis=1).any():
+                continue
+            # Leading bars without any data only delay the start; any other gap needs the panel
+            first = present.any(axis=1).argmax()
+            bars = bars.iloc[first:]
+            if not present[first:].all():
+                gapped.add(symbol)
+            dates = np.datetime_as_string(pd.DatetimeIndex(bars.index).values, unit='D').tolist()
+            histories[symbol] = (dates, bars)
+        if not histories:
+            return 0
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows, states, rebuild = [], [], {}
+                for symbol, (dates, bars) in histories.items():
+                    state = self._load_state(conn, symbol)
+                    if state is None or state.first_date != dates[0] or symbol in gapped:
+                        rebuild[symbol] = (dates, bars)
+                        continue
+                    replayed = self._replay(symbol, state, dates, bars)
+                    if replayed is not None:
+                        rows.extend(replayed[0])
+                        states.append((symbol, replayed[1]))
+                if rebuild:
+                    conn.executemany('DELETE FROM feature_history WHERE symbol = ?', [(symbol,) for symbol in rebuild])
+                    conn.executemany('DELETE FROM indicator_state WHERE symbol = ?', [(symbol,) for symbol in rebuild])
+                    rebuilt_rows, rebuilt_states = self._rebuild(rebuild)
+                    rows.extend(rebuilt_rows)
+                    states.extend(rebuilt_states)
+
+                conn.executemany('''
+                    INSERT OR REPLACE INTO feature_history (symbol, date, sma_20, sma_50, ema_20, ema_50, volume_mean)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.executemany('''
+                    INSERT INTO indicator_state (symbol, state) VALUES (?, ?)
+                    ON CONFLICT(symbol) DO UPDATE SET state=excluded.state
+                ''', states)
+                conn.commit()
+            finally:
+                conn.close()
+        return len(rows)
+
+    def features(self, symbol, stock):
+        """
+        Incremental equivalent of create_features(stock) for one symbol.
+        """
+        return self.features_many({symbol: stock})[symbol]
+
+    def features_many(self, stocks):
+        """
+        Incremental equivalent of create_panel_features(stocks).
+
+        Returns:
+            dict: symbol -> copy of its frame with the feature columns added and incomplete rows dropped.
+        """
+        self.update_many(stocks)
+        result = {}
+        conn = self._connect()
+        try:
+            for symbol, stock in stocks.items():
+                rows = conn.execute('''
+                    SELECT date, sma_20, sma_50, ema_20, ema_50, volume_mean FROM feature_history
+                    WHERE symbol = ? ORDER BY date
+                ''', (symbol,)).fetchall()
+                features = pd.DataFrame(rows, columns=['Date'] + FEATURE_NAMES)
+                features.index = pd.DatetimeIndex(features.pop('Date').to_numpy(dtype='datetime64[D]'))
+                data = stock.copy()
+                data.index = pd.DatetimeIndex(data.index)
+                data = data.join(features, how='inner')
+                data.dropna(inplace=True)
+                result[symbol] = data
+        finally:
+            conn.close()
+        return result
+
+
+_feature_store = None
+_feature_store_lock = threading.Lock()
+
+
+def get_feature_store():
+    """
+    Returns the process-wide incremental feature store.
+    """
+    global _feature_store
+    with _feature_store_lock:
+        if _feature_store is None:
+            _feature_store = IncrementalFeatureStore()
+        return _feature_store
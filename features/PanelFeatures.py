@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+FEATURE_NAMES = ['SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'Volume_Mean']
+
+
+def rolling_mean(values, window):
+    """
+    Column-wise rolling mean of a (dates, symbols) array, NaN where the window holds a missing value.
+    Matches pandas rolling(window).mean() for every column at once.
+    """
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1, values.shape[1]))
+    sums = np.concatenate((zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)))
+    counts = np.concatenate((zeros, np.cumsum(valid, axis=0)))
+
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        window_sums = sums[window:] - sums[:-window]
+        window_counts = counts[window:] - counts[:-window]
+        out[window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return out
+
+
+def _ewm_mean_gaps(values, alpha):
+    # Date-by-date recurrence, vectorized across symbols, for columns with missing bars mid-history
+    out = np.empty(values.shape)
+    mean = np.full(values.shape[1], np.nan)
+    old_weight = np.ones(values.shape[1])
+    for t in range(len(values)):
+        x = values[t]
+        valid = ~np.isnan(x)
+        started = ~np.isnan(mean)
+        old_weight = np.where(started, old_weight * (1 - alpha), old_weight)
+        blended = (old_weight * mean + alpha * x) / (old_weight + alpha)
+        mean = np.where(valid, np.where(started, blended, x), mean)
+        old_weight = np.where(valid, 1.0, old_weight)
+        out[t] = mean
+    return out
+
+
+def ewm_mean(values, span):
+    """
+    Column-wise exponential moving average of a (dates, symbols) array, matching pandas
+    ewm(span=span, adjust=False).mean(): it starts at each column's first valid value, carries the
+    last value through missing bars, and decays the old value across such gaps.
+    """
+    alpha = 2.0 / (span + 1)
+    valid = ~np.isnan(values)
+    out = np.full(values.shape, np.nan)
+    listed = valid.any(axis=0)
+    first = valid.argmax(axis=0)
+    after_first = np.arange(len(values))[:, None] >= first
+
+    # Columns without gaps after their first bar are a plain linear recurrence: run them all
+    # through one IIR filter, seeding the leading NaNs with the first value so the EMA stays flat
+    contiguous = listed & (valid == after_first).all(axis=0)
+    if contiguous.any():
+        columns = values[:, contiguous]
+        seeds = columns[first[contiguous], np.arange(columns.shape[1])]
+        filled = np.where(np.isnan(columns), seeds, columns)
+        smoothed, _ = lfilter([alpha], [1.0, alpha - 1.0], filled, axis=0, zi=(1 - alpha) * seeds[None, :])
+        out[:, contiguous] = np.where(after_first[:, contiguous], smoothed, np.nan)
+
+    gapped = listed & ~contiguous
+    if gapped.any():
+        out[:, gapped] = _ewm_mean_gaps(values[:, gapped], alpha)
+    return out
+
+
+def compute_panel_features(close, volume, mask=None):
+    """
+    Compute every create_features indicator for a whole universe in one pass.
+
+    Parameters:
+        close (numpy.ndarray): (dates, symbols) closing prices, NaN where a symbol has no bar.
+        volume (numpy.ndarray): (dates, symbols) traded volume aligned with close.
+        mask (numpy.ndarray, optional): (dates, symbols) booleans, False for bars to treat as missing,
+            e.g. before a symbol listed or after it was suspended.
+
+    Returns:
+        dict: Feature name -> (dates, symbols) array.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    if mask is not None:
+        close = np.where(mask, close, np.nan)
+        volume = np.where(mask, volume, np.nan)
+    return {
+        'SMA_20': rolling_mean(close, 20),
+        'SMA_50': rolling_mean(close, 50),
+        'EMA_20': ewm_mean(close, 20),
+        'EMA_50': ewm_mean(close, 50),
+        'Volume_Mean': rolling_mean(volume, 20),
+    }
+
+
+def build_panel(frames):
+    """
+    Stack per-symbol price frames into (bars, symbols) arrays aligned on each symbol's latest bar.
+
+    Each column holds the symbol's own bar sequence, like the frame create_features would see, and
+    shorter histories are padded with NaN at the top. A date that one symbol has and another lacks
+    (a suspension, a different listing date) therefore never shifts the windows of the other.
+
+    Parameters:
+        frames (dict): symbol -> DataFrame with Close and Volume columns.
+
+    Returns:
+        tuple: (symbols, close, volume, mask) where close/volume are (bars, symbols) arrays and mask
+            marks the rows that hold a bar of the symbol.
+    """
+    symbols = list(frames)
+    bars = max((len(frame) for frame in frames.values()), default=0)
+    close = np.full((bars, len(symbols)), np.nan)
+    volume = np.full((bars, len(symbols)), np.nan)
+    mask = np.zeros((bars, len(symbols)), dtype=bool)
+    for column, symbol in enumerate(symbols):
+        frame = frames[symbol]
+        first = bars - len(frame)
+        close[first:, column] = np.asarray(frame['Close'], dtype=np.float64).reshape(-1)
+        volume[first:, column] = np.asarray(frame['Volume'], dtype=np.float64).reshape(-1)
+        mask[first:, column] = True
+    return symbols, close, volume, mask
+
+
+def create_panel_features(frames):
+    """
+    create_features for many symbols at once.
+
+    Parameters:
+        frames (dict): symbol -> price DataFrame as returned by download_stock_data.
+
+    Returns:
+        dict: symbol -> copy of its frame with the feature columns added and incomplete rows dropped.
+    """
+    symbols, close, volume, mask = build_panel(frames)
+    features = compute_panel_features(close, volume, mask)
+    stacked = np.stack([features[name] for name in FEATURE_NAMES], axis=-1)
+    result = {}
+    for column, symbol in enumerate(symbols):
+        frame = frames[symbol]
+        block = stacked[len(stacked) - len(frame):, column]
+        # Same rows as dropna() on the combined frame, without rebuilding it twice
+        keep = frame.notna().to_numpy().all(axis=1) & ~np.isnan(block).any(axis=1)
+        data = pd.concat([frame, pd.DataFrame(block, index=frame.index, columns=FEATURE_NAMES)], axis=1)
+        result[symbol] = data.iloc[keep]
+    return result
@@ -3,10 +3,18 @@ import logging
 
 from flask import Flask, render_template
 from flask import jsonify
+from flask_socketio import SocketIO
 
-from utils.util import execute_query, check_index_existence
+from create_db import create_db
+from utils.metrics import instrument_app
+from utils.prediction_feed import PredictionFeed
+from utils.prediction_listing import prediction_export, prediction_listing
+from utils.db import execute_query, check_index_existence
 
 app = Flask(__name__)
+socketio = SocketIO(app)
+prediction_feed = PredictionFeed(socketio, 'predictions_linear')
+instrument_app(app, 'linear_predict')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -14,38 +22,19 @@ logger = logging.getLogger(__name__)
 # API endpoint to get stocks with the biggest profit
 @app.route('/get_predictions', methods=['GET'])
 def get_top_stocks():
-    query = '''
-        SELECT company_name, security_id, current_price, predicted_price, (predicted_price - current_price) AS profit
-        FROM predictions_linear
-        WHERE active = 1
-        ORDER BY profit DESC
-    '''
-    rows = execute_query(query, fetchall=True)
-
-    stocks = []
-    for row in rows:
-        # Check if any value is None and provide a default value (e.g., 0.0)
-        company_name = row.get("company_name", "")
-        security_id = row.get("security_id", "")
-        current_price = row.get("current_price")
-        predicted_price = row.get("predicted_price")
-        profit = row.get("profit")
-
-        # Provide default values if any of these are None
-        current_price = float(current_price) if current_price is not None else 0.0
-        predicted_price = float(predicted_price) if predicted_price is not None else 0.0
-        profit = float(profit) if profit is not None else 0.0
-
-        stock = {
-            "company_name": company_name,
-            "security_id": security_id,
-            "current_price": current_price,
-            "predicted_price": predicted_price,
-            "profit": profit
-        }
-        stocks.append(stock)
-
-    return jsonify(stocks), 200
+    return prediction_listing('predictions_linear')
+
+
+# Streams the whole listing instead of building it in memory
+@app.route('/get_predictions/export', methods=['GET'])
+def export_predictions():
+    return prediction_export('predictions_linear')
+
+
+# Dashboards subscribe once and are pushed the changed rows instead of polling /get_predictions
+@socketio.on('subscribe')
+def subscribe_predictions():
+    prediction_feed.subscribe()
 
 
 @app.route('/search/<security_id>', methods=['GET'])
@@ -87,5 +76,7 @@ def index():
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # Development server; the containers serve the app with gunicorn instead
+    create_db()
+    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
 
@@ -1,65 +1,184 @@
+import atexit
 import threading
 import time
 
 from flask import Flask, jsonify
 import schedule
-from bsedata.bse import BSE
 from datetime import datetime
 import logging
 
 import create_db
-from model.training_script import download_stock_data
-from utils.util import execute_query, predict_algo, check_index_existence
+from dataclass_db.dataclass_db_executor import parse_number, upsert_predictions
+from dataclass_db.stock_predictions import PredictionLinear
+from datasource.data_source import get_data_source
+from executors.ingestion import QuoteIngestionEngine, queue_depth
+from executors.leases import WorkLeases
+from executors.scheduler import IncrementalScheduler
+from model.training_script import download_stock_data, prefetch_stock_data
+from utils.metrics import get_metrics_registry, instrument_app, timed
+from utils.db import execute_query, check_index_existence
+from utils.ml import prepare_inference_window, predict_batch, PREDICTION_BATCH_SIZE
 
 app = Flask(__name__)
+instrument_app(app, 'linear_predict_scheduler')
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 scheduler = schedule.Scheduler()
+# Shared by every batch, so its pools and rate limit carry over from one chunk to the next
+quote_engine = QuoteIngestionEngine(lambda code: get_data_source().get_quote(code))
 
-def update_database():
-    logger.info("Scheduler started")
-    b = BSE()
-    b.updateScripCodes()
-    funds = b.getScripCodes()
-    stock_symbol = None
+def write_predictions(pending, predicted_prices):
+    """
+    Write a chunk of predictions to predictions_linear in a single transaction.
+    """
+    prediction_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    predictions = []
+    for (quote, stock_symbol, current_price), predicted_price in zip(pending, predicted_prices):
+        logger.info(f"Predicted price: {predicted_price}, Current price: {current_price} for {quote.get('companyName')}")
+        predictions.append(PredictionLinear(quote.get('companyName'), stock_symbol, current_price, predicted_price,
+                                            prediction_date, active=1))
+    upsert_predictions(predictions, table='predictions_linear')
+
+
+def run_inference(pending, windows, scalers, batch_size):
+    """
+    Run one batched predict call over the collected windows and store the results.
+
+    Returns:
+        bool: Whether the predictions were written.
+    """
+    try:
+        predicted_prices = predict_batch(windows, scalers, batch_size=batch_size)
+        write_predictions(pending, predicted_prices)
+    except Exception as e:
+        logger.error(f"Error predicting batch of {len(pending)} symbols: {str(e)}")
+        return False
+    return True
+
+
+@timed('scheduler_batch')
+def predict_codes(codes, batch_size=PREDICTION_BATCH_SIZE):
+    """
+    Fetch the quotes of codes and re-predict the symbols whose quote or price history changed since
+    their last prediction.
 
-    # if not check_index_existence('idx_security_id_linear', 'predictions_linear'):
-    #     logger.error("Index idx_security_id_linear does not exist")
-    #     return
+    Returns:
+        dict: scrip code -> True (predicted), False (unchanged) or None (inactive). Codes whose quote
+            or prediction failed are left out so the scheduler retries them.
+    """
+    outcomes = {}
+    # Leave codes another worker has taken over since the tick started to that worker
+    codes = work_leases.held(codes)
 
-    for code, name in funds.items():
+    active_quotes = []
+    for code, quote in quote_engine.fetch_quotes(codes).items():
+        stock_symbol = quote.get('securityID')
+        if not stock_symbol:
+            # Left out of outcomes, so it counts as failed and is retried without failing the batch
+            logger.error(f"Quote for {code} has no securityID")
+            continue
+        query = 'SELECT active FROM predictions_linear WHERE security_id = ?'
+        row = execute_query(query, (stock_symbol,), fetchone=True)
+        if row is not None and row['active'] != 1:
+            logger.warning(f"Stock {stock_symbol} is marked as inactive for {quote.get('companyName')}")
+            outcomes[code] = None
+            continue
         try:
-            quote = b.getQuote(code)
-            stock_symbol = quote.get('securityID')
-            stock_symbol_yahoo = stock_symbol + '.BO'  # Assuming it's a BSE stock
-            query = 'SELECT active FROM predictions_linear WHERE security_id = ?'
-            row = execute_query(query, (stock_symbol,), fetchone=True)
-            if row is None or row['active'] == 1:
-                stock_data = download_stock_data(stock_symbol_yahoo)
-                predicted_price = predict_algo(stock_data, stock_symbol)
-                current_price = float(quote['currentValue'].replace(',', ''))  # Handle comma in numbers
-                logger.info(f"Predicted price: {predicted_price}, Current price: {current_price} for {quote.get('companyName')}")
-                query = '''
-                    INSERT INTO predictions_linear (company_name, security_id, current_price, predicted_price, prediction_date, active)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(security_id) DO UPDATE SET
-                        company_name=excluded.company_name,
-                        current_price=excluded.current_price,
-                        predicted_price=excluded.predicted_price,
-                        prediction_date=excluded.prediction_date,
-                        active=excluded.active
-                '''
-                execute_query(query, (quote.get('companyName'), stock_symbol, current_price, predicted_price,
-                                      datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 1), commit=True)
-            else:
-                logger.warning(f"Stock {stock_symbol} is marked as inactive for {quote.get('companyName')}")
+            current_price = parse_number(quote.get('currentValue'))
+        except ValueError:
+            current_price = None
+        if current_price is None:
+            # No price to predict from (e.g. '-' when the stock has not traded); skipped until it has one
+            logger.warning(f"Stock {stock_symbol} has no current value ({quote.get('currentValue')!r}), skipping it")
+            outcomes[code] = False
+            continue
+        active_quotes.append((code, quote, current_price))
+
+    # Refresh the price history of the whole batch with bulk requests before reading it per symbol
+    prefetch_stock_data([quote['securityID'] + '.BO' for _, quote, _ in active_quotes])
 
+    # Windows are collected across symbols and predicted together in one call
+    pending, windows, scalers, fingerprints = [], [], [], {}
+    for code, quote, current_price in active_quotes:
+        stock_symbol = quote.get('securityID')
+        try:
+            stock_symbol_yahoo = stock_symbol + '.BO'  # Assuming it's a BSE stock
+            stock_data = download_stock_data(stock_symbol_yahoo)
+            if stock_data is None:
+                raise Exception("Inactive stock")
+            fingerprint = (quote.get('updatedOn'), str(stock_data.index[-1]))
+            if not incremental_scheduler.has_changed(code, fingerprint):
+                outcomes[code] = False
+                continue
+            window, scaler = prepare_inference_window(stock_data)
+            pending.append((quote, stock_symbol, current_price))
+            windows.append(window)
+            scalers.append(scaler)
+            fingerprints[code] = fingerprint
         except Exception as e:
             logger.error(f"Error predicting for {stock_symbol}: {str(e)}")
             if e is not None or str(e) == "Inactive stock":
                 query = 'UPDATE predictions_linear SET active = 0 WHERE security_id = ?'
                 execute_query(query, (stock_symbol,), commit=True)
+            outcomes[code] = None
+
+    # Fetching the batch can outlast a lease; drop the predictions of codes lost meanwhile rather than
+    # writing them next to the new owner's
+    held = set(work_leases.held(fingerprints))
+    if len(held) < len(fingerprints):
+        logger.warning(f"Dropping {len(fingerprints) - len(held)} predictions whose lease was lost")
+        keep = [index for index, code in enumerate(fingerprints) if code in held]
+        pending, windows, scalers = ([items[index] for index in keep] for items in (pending, windows, scalers))
+        fingerprints = {code: fingerprint for code, fingerprint in fingerprints.items() if code in held}
+
+    if pending and run_inference(pending, windows, scalers, batch_size):
+        for code, fingerprint in fingerprints.items():
+            incremental_scheduler.record(code, fingerprint)
+            outcomes[code] = True
+    return outcomes
+
+
+UNIVERSE_REFRESH_SECONDS = 3600
+work_leases = WorkLeases()
+_universe_synced_at = None
+
+
+def owned_codes():
+    """
+    Scrip codes this scheduler process is responsible for until the next tick.
+
+    The universe in work_leases is refreshed from the data source hourly; on every tick the leases
+    are renewed and rebalanced, so several scheduler processes split the codes between them.
+    """
+    global _universe_synced_at
+    if _universe_synced_at is None or time.monotonic() - _universe_synced_at >= UNIVERSE_REFRESH_SECONDS:
+        work_leases.sync_universe(get_data_source().get_scrip_codes())
+        _universe_synced_at = time.monotonic()
+    codes = work_leases.rebalance()
+    # Keeps the leases renewed while the tick's batches run, however long they take
+    work_leases.start_heartbeat()
+    return codes
+
+
+incremental_scheduler = IncrementalScheduler(owned_codes, predict_codes, batch_size=PREDICTION_BATCH_SIZE,
+                                             universe_refresh=0)
+registry = get_metrics_registry()
+registry.gauge('stock_sense_scheduler_last_tick', 'Statistics of the last scheduler tick.',
+               lambda: {(stat,): value for stat, value in (incremental_scheduler.last_stats or {}).items()}, ('stat',))
+registry.gauge('stock_sense_scheduler_queue_size', 'Symbols in the scheduler priority queue.',
+               lambda: incremental_scheduler.queue_size)
+registry.gauge('stock_sense_scheduler_skipped_ticks_total', 'Ticks skipped because the previous one was running.',
+               lambda: incremental_scheduler.skipped_ticks, type='counter')
+registry.gauge('stock_sense_ingestion_queue_depth', 'Quotes fetched but not yet written.', queue_depth)
+
+
+@timed('scheduler_tick')
+def update_database():
+    """
+    Run one scheduler tick: re-predict the due symbols that changed, within the tick's time budget.
+    """
+    return incremental_scheduler.tick()
 
 def job():
     logger.info("Starting the scheduled job...")
@@ -89,4 +208,6 @@ def index():
 
 if __name__ == '__main__':
     create_db.create_db()
+    # Hand the codes back on a clean shutdown instead of making the other workers wait for the leases to expire
+    atexit.register(work_leases.release)
     app.run(host='0.0.0.0', port=5002, debug=True)
@@ -1,64 +1,62 @@
-import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, jsonify, render_template, url_for
+from flask_socketio import SocketIO
 
-from flask import Flask, jsonify, render_template
-
-from dataclass_db.dataclass_db_executor import fetch_quotes_batch
-from executors.executor import prediction_executor, data_retriever_executor
-from utils.util import get_db_connection
+from create_db import create_db
+from executors.jobs import job_manager
+from utils.prediction_feed import PredictionFeed
+from executors.ingestion import queue_depth
+from utils.metrics import get_metrics_registry, instrument_app
+from utils.prediction_listing import prediction_export, prediction_listing
 
 app = Flask(__name__)
+socketio = SocketIO(app)
+prediction_feed = PredictionFeed(socketio, 'predictions')
+instrument_app(app, 'main')
+get_metrics_registry().gauge('stock_sense_pipeline_queue_depth', 'Items waiting per prediction pipeline stage.',
+                             lambda: {(stage,): depth for stage, depth in job_manager.queue_depths().items()},
+                             ('stage',))
+get_metrics_registry().gauge('stock_sense_jobs', 'Retained prediction jobs by status.',
+                             lambda: {(status,): count for status, count in job_manager.status_counts().items()},
+                             ('status',))
+get_metrics_registry().gauge('stock_sense_ingestion_queue_depth', 'Quotes fetched but not yet written.', queue_depth)
 
 
 @app.route('/trigger_prediction', methods=['POST'])
 def trigger_prediction():
-    offset = 0
-    batch_size = 3
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        # future_data_retriever = executor.submit(data_retriever_executor)
-        # future_data_retriever.result()
-        futures = []
-        while True:
-            batch = fetch_quotes_batch(batch_size, offset)
-            if len(batch) == 3:
-                # logging.info("Batch: ", batch)
-                futures.append(executor.submit(data_retriever_executor))
-                # futures.append(executor.submit(prediction_executor, batch[0].__dict__))
-                # futures.append(executor.submit(prediction_executor, batch[1].__dict__))
-                # futures.append(executor.submit(prediction_executor, batch[2].__dict__))
-            else:
-                for quote in batch:
-                    # logging.info("Quote: ", quote)
-                    executor.submit(prediction_executor, quote.__dict__)
-                break
-            for future in as_completed(futures):
-                try:
-                    future.result()  # Block until each future is done
-                except Exception as e:
-                    logging.error(f"An error occurred during prediction: {e}")
-
-            offset += batch_size
-    return jsonify({'message': 'Predictions triggered and data stored to DB'}), 200
+    """
+    Queue a prediction run over all stored quotes and return immediately with its job ID.
+    Progress is reported by /jobs/<job_id>.
+    """
+    job = job_manager.submit()
+    return jsonify({'message': 'Prediction job queued', 'job_id': job.id,
+                    'status_url': url_for('get_job', job_id=job.id)}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"message": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
 
 
 # API endpoint to get stocks with the biggest profit
 @app.route('/get_predictions', methods=['GET'])
 def get_top_stocks():
-    conn = get_db_connection()
-    c = conn.cursor()
+    return prediction_listing('predictions')
+
 
-    c.execute('''
-        SELECT company_name, security_id, current_price, predicted_price, (predicted_price - current_price) AS profit
-        FROM predictions
-        ORDER BY profit DESC
-    ''')
-    rows = c.fetchall()
+# Streams the whole listing instead of building it in memory
+@app.route('/get_predictions/export', methods=['GET'])
+def export_predictions():
+    return prediction_export('predictions')
 
-    conn.close()
 
-    stocks = [dict(row) for row in rows]
+# Dashboards subscribe once and are pushed the changed rows instead of polling /get_predictions
+@socketio.on('subscribe')
+def subscribe_predictions():
+    prediction_feed.subscribe()
 
-    return jsonify(stocks), 200
 
 @app.route('/')
 def index():
@@ -66,4 +64,6 @@ def index():
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', debug=False, port=5005)
+    # Development server; the containers serve the app with gunicorn instead
+    create_db()
+    socketio.run(app, host='0.0.0.0', debug=False, port=5005)
@@ -1,51 +1,162 @@
 import logging
 
 import numpy as np
-import yfinance as yf
 from keras.src.callbacks import EarlyStopping
 from keras.src.models import Sequential
 from sklearn.preprocessing import MinMaxScaler
 from tensorflow.keras.layers import Dense, LSTM, Dropout, Bidirectional
 
 from features.FeatureFactory import create_features
+from features.IncrementalIndicators import get_feature_store
+from model.registry import get_model_registry, model_version
+from model.training_script import download_stock_data
+from model.windowing import last_window, sliding_windows
+from utils.metrics import timed
 
+FEATURE_COLUMNS = ['Close', 'SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'Volume_Mean']
+TIME_STEP = 60
+ARCHITECTURE = 'bilstm50-dropout-lstm50-dropout-dense1'
+FINE_TUNE_EPOCHS = 5
+# Bars added by fine-tuning before the model and its scaler are retrained from scratch
+FULL_RETRAIN_BARS = 250
 
-def predict_max_profit(symbol):
-    try:
-        stock = yf.download(symbol, start='2010-01-01', end='2023-07-16')
+
+def load_history(symbol):
+    """
+    Price history used to train the per-symbol model.
+    """
+    stock = download_stock_data(symbol, start='2010-01-01', end='2023-07-16')
+    if stock is None:
+        raise Exception("Inactive stock")
+    return stock
+
+
+@timed('prepare_training_data')
+def prepare_training_data(stock, symbol=None):
+    """
+    Compute the model features.
+
+    With a symbol, indicators come from the incremental feature store, which only processes the
+    bars added since the symbol's previous run.
+
+    Returns:
+        tuple: (data, dates), a compact float32 (bars, features) array of unscaled features and the
+            matching datetime64[D] dates. Scaling and windowing happen in train_and_predict, so only
+            these arrays have to be shipped to a training worker.
+    """
+    if symbol is not None:
+        stock = get_feature_store().features(symbol, stock)
+    else:
         stock = create_features(stock)
-        data = stock[['Close', 'SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'Volume_Mean']].values
+    return _training_arrays(stock)
 
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(data)
 
-        x_train, y_train = [], []
-        for i in range(60, len(scaled_data)):
-            x_train.append(scaled_data[i-60:i])
-            y_train.append(scaled_data[i, 0])
+@timed('prepare_training_data_many')
+def prepare_training_data_many(stocks):
+    """
+    prepare_training_data for a batch of symbols. Symbols the feature store has to compute from
+    scratch are computed together as one panel.
+
+    Parameters:
+        stocks (dict): symbol -> price history from load_history.
+
+    Returns:
+        dict: symbol -> (data, dates) as returned by prepare_training_data.
+    """
+    return {symbol: _training_arrays(stock) for symbol, stock in get_feature_store().features_many(stocks).items()}
+
+
+def _training_arrays(stock):
+    data = stock[FEATURE_COLUMNS].values.astype(np.float32)
+    dates = stock.index.values.astype('datetime64[D]')
+    return data, dates
+
 
-        x_train, y_train = np.array(x_train), np.array(y_train)
+def build_model(input_shape):
+    model = Sequential()
+    model.add(Bidirectional(LSTM(units=50, return_sequences=True, input_shape=input_shape)))
+    model.add(Dropout(0.2))
+    model.add(LSTM(units=50))
+    model.add(Dropout(0.2))
+    model.add(Dense(1))
 
-        model = Sequential()
-        model.add(Bidirectional(LSTM(units=50, return_sequences=True, input_shape=(x_train.shape[1], x_train.shape[2]))))
-        model.add(Dropout(0.2))
-        model.add(LSTM(units=50))
-        model.add(Dropout(0.2))
-        model.add(Dense(1))
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
 
-        model.compile(optimizer='adam', loss='mean_squared_error')
-        early_stopping = EarlyStopping(monitor='loss', patience=10, restore_best_weights=True)
-        model.fit(x_train, y_train, epochs=100, batch_size=32, verbose=2, callbacks=[early_stopping])
 
-        last_60_days = stock[['Close', 'SMA_20', 'SMA_50', 'EMA_20', 'EMA_50', 'Volume_Mean']][-60:].values
-        last_60_days_scaled = scaler.transform(last_60_days)
-        x_test = [last_60_days_scaled]
-        x_test = np.array(x_test)
+def _fit(model, x_train, y_train, epochs):
+    early_stopping = EarlyStopping(monitor='loss', patience=10, restore_best_weights=True)
+    model.fit(x_train, y_train, epochs=epochs, batch_size=32, verbose=2, callbacks=[early_stopping])
 
-        predicted_price = model.predict(x_test)
-        predicted_price = scaler.inverse_transform(np.concatenate((predicted_price, np.zeros((1, data.shape[1] - 1))), axis=1))[:,0]
 
-        return predicted_price[0]
+@timed('train_and_predict')
+def train_and_predict(data, dates, symbol=None, registry=None, epochs=100, fine_tune_epochs=FINE_TUNE_EPOCHS):
+    """
+    Train a Bidirectional LSTM on the feature windows and predict the next closing price.
+
+    With a symbol and registry, a stored model of the same version is loaded and fine-tuned only on
+    the bars added since it was last trained. A full retrain happens when there is no usable entry
+    or once FULL_RETRAIN_BARS bars have been added incrementally, so the scaler is refitted
+    regularly. The updated model is stored back in the registry.
+
+    Parameters:
+        data (numpy.ndarray): Unscaled (bars, features) array from prepare_training_data.
+        dates (numpy.ndarray): Date of every row of data.
+        symbol (str, optional): Registry key, e.g. 'RELIANCE.BO'.
+        registry (ModelRegistry, optional): Where models are loaded from and saved to.
+        epochs (int): Maximum epochs of a full training run.
+        fine_tune_epochs (int): Maximum epochs of an incremental update.
+
+    Returns:
+        float: The predicted closing price.
+    """
+    version = model_version(FEATURE_COLUMNS, TIME_STEP, dates[0], ARCHITECTURE)
+    last_date = str(dates[-1])
+    entry = registry.load(symbol, version) if registry is not None and symbol else None
+    if entry is not None:
+        model, scaler, meta = entry
+        new_bars = int((dates > np.datetime64(meta['last_trained_date'])).sum())
+        if meta['incremental_bars'] + new_bars >= FULL_RETRAIN_BARS:
+            entry = None
+
+    if entry is None:
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled_data = scaler.fit_transform(data)
+        x_train = sliding_windows(scaled_data, TIME_STEP)
+        y_train = scaled_data[TIME_STEP:, 0]
+        model = build_model((x_train.shape[1], x_train.shape[2]))
+        _fit(model, x_train, y_train, epochs)
+        meta = {'version': version, 'symbol': symbol, 'features': FEATURE_COLUMNS, 'time_step': TIME_STEP,
+                'data_start': str(dates[0]), 'full_trained_date': last_date, 'last_trained_date': last_date,
+                'incremental_bars': 0}
+        trained = True
+    else:
+        scaled_data = scaler.transform(data)
+        trained = new_bars > 0
+        if trained:
+            # Only the windows whose target is one of the new bars
+            x_train = sliding_windows(scaled_data, TIME_STEP)[-new_bars:]
+            y_train = scaled_data[TIME_STEP:, 0][-new_bars:]
+            _fit(model, x_train, y_train, fine_tune_epochs)
+            meta = dict(meta, last_trained_date=last_date, incremental_bars=meta['incremental_bars'] + new_bars)
+        logging.info(f"{symbol}: warm start from {meta['last_trained_date']}, fine-tuned on {new_bars} new bars")
+
+    if trained and registry is not None and symbol:
+        registry.save(symbol, model, scaler, meta)
+
+    x_test = last_window(scaled_data, TIME_STEP)
+    predicted_price = model.predict(x_test)
+    predicted_price = scaler.inverse_transform(np.concatenate((predicted_price, np.zeros((1, data.shape[1] - 1))), axis=1))[:,0]
+
+    return predicted_price[0]
+
+
+@timed('predict_max_profit')
+def predict_max_profit(symbol):
+    try:
+        stock = load_history(symbol)
+        data, dates = prepare_training_data(stock, symbol=symbol)
+        return train_and_predict(data, dates, symbol=symbol, registry=get_model_registry())
     except Exception as e:
         logging.error(f"Error predicting for {symbol}: {e.__str__()}")
-        raise e
\ No newline at end of file
+        raise e
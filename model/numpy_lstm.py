@@ -0,0 +1,323 @@
+"""
+NumPy forward pass for the LSTM/Dense stacks built by training_script.build_model and
+keras_model.build_model.
+
+A single next-day prediction through Keras is dominated by TensorFlow's per-call dispatch, not by
+the arithmetic of a 50-unit LSTM. export_weights() writes the weights of a trained model to an .npz
+file once; load_numpy_model() reads it back into a NumpyLSTMModel whose predict() mirrors
+model.predict and needs neither TensorFlow nor Keras.
+
+    python -m model.numpy_lstm model/optimized_stock_prediction_model.h5
+"""
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Largest absolute difference from the Keras outputs accepted by export_weights
+DEFAULT_TOLERANCE = 1e-4
+
+
+def _sigmoid(x):
+    return 0.5 * (np.tanh(0.5 * x) + 1.0)
+
+
+def _hard_sigmoid(x):
+    # Keras 3 definition: relu6(x + 3) / 6
+    return np.clip(x / 6.0 + 0.5, 0.0, 1.0)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'relu': lambda x: np.maximum(x, 0.0),
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Unsupported activation {name!r}")
+    return ACTIVATIONS[name]
+
+
+class NumpyLSTMModel:
+    """
+    Inference-only equivalent of a Keras Sequential stack of LSTM, Bidirectional(LSTM), Dropout and
+    Dense layers. Dropout is the identity at inference and is not stored.
+
+    Parameters:
+        layers (list): Layer specs, dicts with a 'type' and the layer's weights as numpy arrays,
+            as produced by layer_specs().
+    """
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def predict(self, x, batch_size=None, verbose=0):
+        """
+        Forward pass over a batch of windows.
+
+        Parameters:
+            x (numpy.ndarray): (samples, time_step, features) inputs.
+            batch_size (int, optional): Samples computed at a time; all of them when None.
+            verbose: Ignored, accepted so the model is a drop-in for keras Model.predict.
+
+        Returns:
+            numpy.ndarray: (samples, outputs) float32 predictions.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        batch_size = batch_size or len(x)
+        outputs = [self._forward(x[start:start + batch_size]) for start in range(0, len(x), batch_size)]
+        return np.concatenate(outputs) if outputs else np.zeros((0, self.output_size), dtype=np.float32)
+
+    __call__ = predict
+
+    @property
+    def output_size(self):
+        last = self.layers[-1]
+        return last['kernel'].shape[1] if last['type'] == 'dense' else _lstm_size(last)
+
+    def _forward(self, x):
+        for layer in self.layers:
+            if layer['type'] == 'lstm':
+                x = _lstm(x, layer)
+            elif layer['type'] == 'bidirectional':
+                x = _bidirectional(x, layer)
+            else:
+                x = _activation(layer['activation'])(x @ layer['kernel'] + layer['bias'])
+        return x
+
+
+def _lstm_size(layer):
+    if layer['type'] == 'bidirectional':
+        size = _lstm_size(layer['forward'])
+        return 2 * size if layer['merge_mode'] == 'concat' else size
+    return layer['recurrent_kernel'].shape[0]
+
+
+def _lstm(x, layer):
+    """
+    Keras LSTM with gates ordered input, forget, cell, output in the kernel columns.
+    """
+    kernel, recurrent_kernel, bias = layer['kernel'], layer['recurrent_kernel'], layer['bias']
+    activation = _activation(layer['activation'])
+    recurrent_activation = _activation(layer['recurrent_activation'])
+    units = recurrent_kernel.shape[0]
+    samples, steps, _ = x.shape
+    if layer['go_backwards']:
+        x = x[:, ::-1]
+
+    # The input projection of every time step in one matrix product; only h @ U stays in the loop
+    projected = x @ kernel + bias
+    h = np.zeros((samples, units), dtype=np.float32)
+    c = np.zeros((samples, units), dtype=np.float32)
+    sequence = np.empty((samples, steps, units), dtype=np.float32) if layer['return_sequences'] else None
+    for step in range(steps):
+        z = projected[:, step] + h @ recurrent_kernel
+        i = recurrent_activation(z[:, :units])
+        f = recurrent_activation(z[:, units:2 * units])
+        g = activation(z[:, 2 * units:3 * units])
+        o = recurrent_activation(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * activation(c)
+        if sequence is not None:
+            sequence[:, step] = h
+    return sequence if sequence is not None else h
+
+
+def _bidirectional(x, layer):
+    forward = _lstm(x, layer['forward'])
+    backward = _lstm(x, layer['backward'])
+    if layer['return_sequences']:
+        # The backward layer ran over the reversed sequence; line its outputs up with the inputs again
+        backward = backward[:, ::-1]
+    merge_mode = layer['merge_mode']
+    if merge_mode == 'concat':
+        return np.concatenate([forward, backward], axis=-1)
+    if merge_mode == 'sum':
+        return forward + backward
+    if merge_mode == 'mul':
+        return forward * backward
+    if merge_mode == 'ave':
+        return (forward + backward) / 2
+    raise ValueError(f"Unsupported merge mode {merge_mode!r}")
+
+
+def _lstm_spec(layer):
+    weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+    if not layer.use_bias:
+        weights.append(np.zeros(weights[0].shape[1], dtype=np.float32))
+    kernel, recurrent_kernel, bias = weights
+    return {
+        'type': 'lstm',
+        'kernel': kernel,
+        'recurrent_kernel': recurrent_kernel,
+        'bias': bias,
+        'activation': layer.activation.__name__,
+        'recurrent_activation': layer.recurrent_activation.__name__,
+        'return_sequences': bool(layer.return_sequences),
+        'go_backwards': bool(layer.go_backwards),
+    }
+
+
+def layer_specs(model):
+    """
+    Extract the layer specs of a trained Keras Sequential model.
+
+    Raises:
+        ValueError: When the model contains a layer the NumPy engine does not implement.
+    """
+    specs = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ('Dropout', 'InputLayer'):
+            continue
+        if kind == 'LSTM':
+            specs.append(_lstm_spec(layer))
+        elif kind == 'Bidirectional' and type(layer.forward_layer).__name__ == 'LSTM':
+            specs.append({
+                'type': 'bidirectional',
+                'forward': _lstm_spec(layer.forward_layer),
+                'backward': _lstm_spec(layer.backward_layer),
+                'merge_mode': layer.merge_mode,
+                'return_sequences': bool(layer.return_sequences),
+            })
+        elif kind == 'Dense':
+            kernel, bias = (layer.get_weights() + [np.zeros(layer.units)])[:2]
+            specs.append({
+                'type': 'dense',
+                'kernel': np.asarray(kernel, dtype=np.float32),
+                'bias': np.asarray(bias, dtype=np.float32),
+                'activation': layer.activation.__name__,
+            })
+        else:
+            raise ValueError(f"Layer {layer.name} ({kind}) is not supported by the NumPy engine")
+    return specs
+
+
+def to_numpy_model(model):
+    """
+    Returns a NumpyLSTMModel computing the same outputs as the Keras model.
+    """
+    return NumpyLSTMModel(layer_specs(model))
+
+
+def _flatten(specs):
+    # .npz files hold flat arrays; the layer structure goes into a JSON header with array references
+    arrays, header = {}, []
+
+    def encode(spec, prefix):
+        entry = {}
+        for key, value in spec.items():
+            if isinstance(value, dict):
+                entry[key] = encode(value, f'{prefix}_{key}')
+            elif isinstance(value, np.ndarray):
+                arrays[f'{prefix}_{key}'] = value
+                entry[key] = {'array': f'{prefix}_{key}'}
+            else:
+                entry[key] = value
+        return entry
+
+    for index, spec in enumerate(specs):
+        header.append(encode(spec, f'layer{index}'))
+    return header, arrays
+
+
+def _unflatten(header, arrays):
+    def decode(entry):
+        spec = {}
+        for key, value in entry.items():
+            if isinstance(value, dict) and 'array' in value:
+                spec[key] = arrays[value['array']]
+            elif isinstance(value, dict):
+                spec[key] = decode(value)
+            else:
+                spec[key] = value
+        return spec
+
+    return [decode(entry) for entry in header]
+
+
+def max_difference(model, numpy_model, x):
+    """
+    Largest absolute difference between the Keras and NumPy predictions for x.
+    """
+    expected = model.predict(x, batch_size=len(x), verbose=0)
+    return float(np.abs(numpy_model.predict(x) - expected).max())
+
+
+def export_weights(model, path, tolerance=DEFAULT_TOLERANCE, samples=8):
+    """
+    Write the weights of a trained Keras model to path (.npz), after checking that the NumPy engine
+    reproduces its outputs on random inputs.
+
+    Parameters:
+        model: Trained Keras Sequential model.
+        path (str): Destination file; replaced atomically.
+        tolerance (float): Largest accepted absolute difference from the Keras outputs.
+        samples (int): Random windows the outputs are compared on.
+
+    Returns:
+        NumpyLSTMModel: The exported model.
+
+    Raises:
+        ValueError: When the model has unsupported layers or its outputs are not reproduced.
+    """
+    numpy_model = to_numpy_model(model)
+    input_shape = tuple(dim for dim in model.input_shape[1:])
+    x = np.random.default_rng(0).random((samples,) + input_shape, dtype=np.float32)
+    difference = max_difference(model, numpy_model, x)
+    if difference > tolerance:
+        raise ValueError(f"NumPy engine differs from Keras by {difference:.2e} (tolerance {tolerance:.0e})")
+
+    header, arrays = _flatten(numpy_model.layers)
+    meta = json.dumps({'format': FORMAT_VERSION, 'input_shape': input_shape, 'layers': header})
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, meta=np.array(meta), **arrays)
+    os.replace(tmp_path, path)
+    logger.info(f"Exported {len(header)} layers to {path} (max difference from Keras {difference:.2e})")
+    return numpy_model
+
+
+def load_numpy_model(path):
+    """
+    Load a model written by export_weights.
+    """
+    with np.load(path, allow_pickle=False) as f:
+        meta = json.loads(str(f['meta']))
+        if meta['format'] != FORMAT_VERSION:
+            raise ValueError(f"{path} has format {meta['format']}, expected {FORMAT_VERSION}")
+        arrays = {name: f[name] for name in f.files if name != 'meta'}
+    return NumpyLSTMModel(_unflatten(meta['layers'], arrays))
+
+
+def weights_path(model_path):
+    """
+    Where the exported weights of the Keras model saved at model_path live.
+    """
+    return os.path.splitext(model_path)[0] + '.npz'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('model', help='Saved Keras model (.h5 or .keras).')
+    parser.add_argument('--output', help='Destination .npz. Defaults to the model path with an .npz extension.')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+    model = tf.keras.models.load_model(args.model)
+    export_weights(model, args.output or weights_path(args.model), args.tolerance)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
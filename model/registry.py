@@ -0,0 +1,112 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from datetime import datetime
+
+REGISTRY_ROOT = 'model/registry'
+
+
+def model_version(feature_columns, time_step, data_start, architecture):
+    """
+    Version key of a trained model. A stored model is only reused when the feature set, window
+    length, start of the training data and network architecture are all unchanged.
+    """
+    key = json.dumps({
+        'features': list(feature_columns),
+        'time_step': time_step,
+        'data_start': str(data_start),
+        'architecture': architecture,
+    }, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+class ModelRegistry:
+    """
+    Per-symbol store of trained Keras models and their scalers.
+
+    Every symbol gets a directory holding model.keras, scaler.pkl and meta.json. meta.json records
+    the version key and the last bar the model was trained on, so the next run can fine-tune on the
+    bars added since instead of training from scratch.
+    """
+
+    def __init__(self, root=REGISTRY_ROOT):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _paths(self, symbol):
+        directory = os.path.join(self.root, symbol)
+        return (os.path.join(directory, 'model.keras'), os.path.join(directory, 'scaler.pkl'),
+                os.path.join(directory, 'meta.json'))
+
+    def load_meta(self, symbol):
+        meta_path = self._paths(symbol)[2]
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def load(self, symbol, version):
+        """
+        Load the stored model of symbol if it matches version.
+
+        Returns:
+            tuple: (model, scaler, meta), or None when nothing usable is stored.
+        """
+        meta = self.load_meta(symbol)
+        if meta is None or meta.get('version') != version:
+            return None
+        model_path, scaler_path, _ = self._paths(symbol)
+        try:
+            import tensorflow as tf
+            model = tf.keras.models.load_model(model_path)
+            with open(scaler_path, 'rb') as f:
+                scaler = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable registry entry for {symbol}: {e}")
+            return None
+        return model, scaler, meta
+
+    def save(self, symbol, model, scaler, meta):
+        """
+        Store model, scaler and metadata for symbol. meta.json is replaced last, so a crash halfway
+        leaves either the previous entry or an entry whose version no longer matches its files.
+        """
+        model_path, scaler_path, meta_path = self._paths(symbol)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        with self._lock:
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            model.save(model_path)
+            with open(scaler_path + '.tmp', 'wb') as f:
+                pickle.dump(scaler, f)
+            os.replace(scaler_path + '.tmp', scaler_path)
+            meta = dict(meta, saved_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + '.tmp', meta_path)
+
+    def invalidate(self, symbol):
+        """
+        Force the next run of symbol to retrain from scratch.
+        """
+        meta_path = self._paths(symbol)[2]
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """
+    Returns the process-wide model registry.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
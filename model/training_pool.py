@@ -0,0 +1,76 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def thread_budget(workers, cores=None):
+    """
+    Split the machine's cores between training workers so that workers x threads = cores.
+
+    Returns:
+        tuple: (intra_op_threads, inter_op_threads) for each worker.
+    """
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // workers), 1
+
+
+def _init_worker(intra_op_threads, inter_op_threads):
+    # Runs once per worker process: TensorFlow is imported and sized before any training starts
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(intra_op_threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(inter_op_threads)
+    os.environ['OMP_NUM_THREADS'] = str(intra_op_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    import model.keras_model  # noqa: F401  warm the Keras/sklearn imports
+    logging.info(f"Training worker {os.getpid()} ready with {intra_op_threads} intra-op threads")
+
+
+def _train(symbol, data, dates, epochs):
+    from model.keras_model import train_and_predict
+    from model.registry import get_model_registry
+    return float(train_and_predict(data, dates, symbol=symbol, registry=get_model_registry(), epochs=epochs))
+
+
+class TrainingPool:
+    """
+    Pool of warm worker processes that train the per-symbol LSTM models.
+
+    Each worker owns its own TensorFlow runtime with a share of the cores, so models train in
+    parallel without contending for the GIL or oversubscribing the CPU. Work is sent as the compact
+    (bars, features) feature array plus its dates; scaling, windowing and the model registry lookup
+    happen inside the worker.
+
+    Parameters:
+        workers (int, optional): Number of worker processes. Defaults to half the cores.
+        epochs (int): Maximum training epochs per symbol.
+    """
+
+    def __init__(self, workers=None, epochs=100):
+        cores = os.cpu_count() or 1
+        self.workers = workers or max(1, cores // 2)
+        self.epochs = epochs
+        self.intra_op_threads, self.inter_op_threads = thread_budget(self.workers, cores)
+        # spawn rather than fork: TensorFlow's runtime is not fork-safe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.intra_op_threads, self.inter_op_threads),
+        )
+
+    def submit(self, symbol, data, dates):
+        """
+        Queue one symbol for training and return a Future with the predicted closing price.
+        """
+        return self._executor.submit(_train, symbol, data, dates, self.epochs)
+
+    def train_and_predict(self, symbol, data, dates):
+        """
+        Train one symbol on a worker and block until its prediction is ready.
+        """
+        return self.submit(symbol, data, dates).result()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -1,16 +1,23 @@
 # training_script.py
 
-import yfinance as yf
-import numpy as np
-from keras import Sequential
 from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
 
+from model.numpy_lstm import export_weights, weights_path
+from model.windowing import last_window, sliding_windows
+from utils.metrics import timed
+from utils.model_cache import get_model_cache
+from utils.price_history import get_history_store
 
+MODEL_FILE = 'model/optimized_stock_prediction_model.h5'
+
+
+@timed('download_stock_data')
 def download_stock_data(symbol, start='2010-01-01', end='2024-07-04'):
     """
     Downloads stock data for a given symbol within a specified date range.
 
+    Bars are served from the local price history store; only days not stored yet are downloaded.
+
     Parameters:
     symbol (str): The stock symbol to download data for.
     start (str): The start date for the data in the format 'YYYY-MM-DD'. Default is '2010-01-01'.
@@ -19,32 +26,46 @@ def download_stock_data(symbol, start='2010-01-01', end='2024-07-04'):
     Returns:
     pandas.DataFrame: A DataFrame containing the stock data if available, otherwise None.
     """
-    stock = yf.download(symbol, start=start, end=end, progress=False)
+    stock = get_history_store().get_history(symbol, start, end)
     if stock is None or stock.empty:
         return None
     return stock
 
 
-def preprocess_data(data, time_step=100):
+def prefetch_stock_data(symbols, start='2010-01-01', end='2024-07-04'):
+    """
+    Bring the local price history of many symbols up to date with bulk upstream requests.
+
+    Parameters:
+    symbols (list): The stock symbols to refresh.
+    start (str): The start date for the data in the format 'YYYY-MM-DD'. Default is '2010-01-01'.
+    end (str): The end date for the data in the format 'YYYY-MM-DD'. Default is '2024-07-04'.
+    """
+    get_history_store().sync_many(symbols, start, end)
+
+
+@timed('preprocess_data')
+def preprocess_data(data, time_step=100, last_only=False):
     """
     Generate function comment for preprocess_data function.
 
     Parameters:
     - data: Input data to be preprocessed.
     - time_step: Number of time steps to look back (default=100).
+    - last_only: Only materialize the final window for inference (default=False).
 
     Returns:
-    - X: Array of input sequences.
-    - y: Array of target values.
+    - X: Array of input sequences. A zero-copy strided view over the scaled data when training,
+      or a single (1, time_step, features) window when last_only is set.
+    - y: Array of target values, None when last_only is set.
     - scaler: Scaler object used for preprocessing.
     """
     scaler = MinMaxScaler(feature_range=(0, 1))
     scaled_data = scaler.fit_transform(data)
-    X, y = [], []
-    for i in range(time_step, len(scaled_data)):
-        X.append(scaled_data[i - time_step:i])
-        y.append(scaled_data[i, 3])  # 'Close' column is the target
-    X, y = np.array(X), np.array(y)
+    if last_only:
+        return last_window(scaled_data, time_step), None, scaler
+    X = sliding_windows(scaled_data, time_step)
+    y = scaled_data[time_step:, 3]  # 'Close' column is the target
     return X, y, scaler
 
 
@@ -58,6 +79,10 @@ def build_model(input_shape):
     Returns:
         tensorflow.keras.Model: Compiled LSTM model.
     """
+    # Imported here so that preprocessing and data access do not load TensorFlow
+    from keras import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
+
     model = Sequential()
     model.add(Input(shape=input_shape))
     model.add(LSTM(units=50, return_sequences=True))
@@ -92,7 +117,11 @@ def train_model(symbol):
 
     model.fit(X, y, epochs=50, batch_size=32, verbose=1)
 
-    model.save('optimized_stock_prediction_model.h5')
+    model.save(MODEL_FILE)
+    # Hand the fresh model to the cache so predictors in this process pick it up without a reload
+    get_model_cache().put(MODEL_FILE, model)
+    weights = weights_path(MODEL_FILE)
+    get_model_cache().put(weights, export_weights(model, weights))
     return model, scaler
 
 
@@ -0,0 +1,41 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data, time_step):
+    """
+    Build the training windows for a (bars, features) array without copying it.
+
+    Window i covers data[i:i + time_step] and is paired with the target at row i + time_step,
+    so only windows that have a following bar are returned.
+
+    Parameters:
+        data (numpy.ndarray): 2D array of shape (bars, features).
+        time_step (int): Number of bars in each window.
+
+    Returns:
+        numpy.ndarray: Read-only strided view of shape (bars - time_step, time_step, features).
+    """
+    data = np.asarray(data)
+    if len(data) <= time_step:
+        return np.empty((0, time_step) + data.shape[1:], dtype=data.dtype)
+    # sliding_window_view appends the window axis last; move it next to the sample axis
+    windows = sliding_window_view(data[:-1], time_step, axis=0)
+    return np.moveaxis(windows, -1, 1)
+
+
+def last_window(data, time_step):
+    """
+    Materialize only the most recent window, as used for a next-step prediction.
+
+    Parameters:
+        data (numpy.ndarray): 2D array of shape (bars, features).
+        time_step (int): Number of bars in the window.
+
+    Returns:
+        numpy.ndarray: Array of shape (1, time_step, features) holding the final time_step bars.
+    """
+    data = np.asarray(data)
+    if len(data) < time_step:
+        raise ValueError(f"Need at least {time_step} bars, got {len(data)}")
+    return np.ascontiguousarray(data[-time_step:])[np.newaxis]
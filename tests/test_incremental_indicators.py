@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features.FeatureFactory import create_features
+from features.IncrementalIndicators import FEATURE_NAMES, IncrementalFeatureStore
+
+
+def make_stock(days, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2020-01-01', periods=days, freq='D', name='Date')
+    close = 100 + np.cumsum(rng.normal(0, 1, days))
+    return pd.DataFrame({'Open': close, 'High': close + 1, 'Low': close - 1, 'Close': close,
+                         'Volume': rng.integers(1000, 5000, days).astype(float)}, index=index)
+
+
+def revise_last_bar(stock):
+    partial = stock.copy()
+    partial.iloc[-1, partial.columns.get_loc('Close')] *= 0.9
+    partial.iloc[-1, partial.columns.get_loc('Volume')] /= 4
+    return partial
+
+
+def with_gaps(stock, close_bars, volume_bars):
+    gapped = stock.copy()
+    gapped.iloc[close_bars, gapped.columns.get_loc('Close')] = np.nan
+    gapped.iloc[volume_bars, gapped.columns.get_loc('Volume')] = np.nan
+    return gapped
+
+
+def pandas_features(stock):
+    # The original pandas indicators create_features has to reproduce
+    data = stock.copy()
+    data['SMA_20'] = data['Close'].rolling(window=20).mean()
+    data['SMA_50'] = data['Close'].rolling(window=50).mean()
+    data['EMA_20'] = data['Close'].ewm(span=20, adjust=False).mean()
+    data['EMA_50'] = data['Close'].ewm(span=50, adjust=False).mean()
+    data['Volume_Mean'] = data['Volume'].rolling(window=20).mean()
+    return data.dropna()
+
+
+def assert_same_features(actual, expected):
+    assert list(actual.index) == list(expected.index)
+    np.testing.assert_allclose(actual[FEATURE_NAMES].values, expected[FEATURE_NAMES].values, rtol=1e-9)
+
+
+def assert_matches_create_features(store, symbol, stock):
+    actual = store.features(symbol, stock)
+    assert_same_features(actual, create_features(stock.copy()))
+    assert_same_features(actual, pandas_features(stock))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IncrementalFeatureStore(db_path=str(tmp_path / 'features.db'))
+
+
+def test_incremental_update_matches_create_features(store):
+    stock = make_stock(200)
+    assert_matches_create_features(store, 'AAA.BO', stock.iloc[:120])
+    assert_matches_create_features(store, 'AAA.BO', stock.iloc[:121])
+    assert_matches_create_features(store, 'AAA.BO', stock)
+
+
+def test_revised_last_bar_is_applied(store):
+    stock = make_stock(200)
+    # The latest bar was partial when first seen, and upstream later returns its final values
+    assert_matches_create_features(store, 'AAA.BO', revise_last_bar(stock.iloc[:150]))
+    assert_matches_create_features(store, 'AAA.BO', stock.iloc[:150])
+    # and the bars after it still build on the revised values
+    assert_matches_create_features(store, 'AAA.BO', revise_last_bar(stock.iloc[:151]))
+    assert_matches_create_features(store, 'AAA.BO', stock)
+
+
+def test_different_first_date_rebuilds(store):
+    stock = make_stock(200)
+    assert_matches_create_features(store, 'AAA.BO', stock.iloc[:120])
+    assert_matches_create_features(store, 'AAA.BO', stock.iloc[10:])
+
+
+def test_features_many_matches_create_features(store):
+    stocks = {f'S{index}.BO': make_stock(100 + 37 * index, seed=index) for index in range(5)}
+    # Rebuilt together as one panel, with a partial last bar, then updated incrementally
+    first = store.features_many({symbol: revise_last_bar(stock.iloc[:-3]) for symbol, stock in stocks.items()})
+    second = store.features_many(stocks)
+    for symbol, stock in stocks.items():
+        for actual, frame in ((first[symbol], revise_last_bar(stock.iloc[:-3])), (second[symbol], stock)):
+            assert_same_features(actual, create_features(frame.copy()))
+            assert_same_features(actual, pandas_features(frame))
+
+
+def test_missing_bars_are_gaps(store):
+    stock = make_stock(300)
+    gapped = with_gaps(stock, close_bars=[80, 81, 150, 220, 260], volume_bars=[150, 240])
+    assert_matches_create_features(store, 'AAA.BO', stock.iloc[:200])
+    # Gaps appear in history that was already processed, then new bars keep arriving after them
+    assert_matches_create_features(store, 'AAA.BO', gapped.iloc[:250])
+    assert_matches_create_features(store, 'AAA.BO', gapped)
+    # Once upstream fills them in, the store is incremental again
+    assert_matches_create_features(store, 'AAA.BO', stock)
+
+
+def test_features_many_with_gaps(store):
+    stocks = {f'S{index}.BO': make_stock(120 + 30 * index, seed=index) for index in range(3)}
+    stocks['S1.BO'] = with_gaps(stocks['S1.BO'], close_bars=[70, 100], volume_bars=[110])
+    for symbol, actual in store.features_many(stocks).items():
+        assert_same_features(actual, pandas_features(stocks[symbol]))
@@ -0,0 +1,86 @@
+import threading
+
+from datasource.data_source import FakeBSE
+from executors.ingestion import QuoteIngestionEngine
+
+
+class HangingBSE(FakeBSE):
+    """
+    FakeBSE whose getQuote blocks for the codes in `hung` until release() is called.
+    """
+
+    def __init__(self, size, hung):
+        super().__init__(size=size)
+        self.hung = set(hung)
+        self._released = threading.Event()
+
+    def getQuote(self, code):
+        if code in self.hung:
+            self._released.wait()
+        return super().getQuote(code)
+
+    def release(self):
+        self._released.set()
+
+
+def make_engine(get_quote, collected, **kwargs):
+    options = dict(workers=4, rate=1e6, timeout=2.0, retries=3, backoff=0.0, write_batch_size=50)
+    options.update(kwargs)
+    return QuoteIngestionEngine(get_quote, sink=collected.extend, **options)
+
+
+def test_run_writes_every_quote_despite_failures():
+    bse = FakeBSE(size=200, latency=0.001, failure_rate=0.1)
+    collected = []
+    engine = make_engine(bse.getQuote, collected, retries=5)
+    try:
+        stats = engine.run(bse.getScripCodes())
+    finally:
+        engine.close()
+    assert stats['fetched'] == stats['written'] == 200
+    assert stats['retries'] > 0
+    assert sorted(quote['scripCode'] for quote in collected) == sorted(bse.getScripCodes())
+
+
+def test_engine_is_reused_across_runs():
+    bse = FakeBSE(size=20)
+    collected = []
+    engine = make_engine(bse.getQuote, collected)
+    try:
+        codes = list(bse.getScripCodes())
+        assert len(engine.fetch_quotes(codes[:10])) == 10
+        pools = engine._pools()
+        assert len(engine.fetch_quotes(codes[10:])) == 10
+        assert engine._pools() == pools
+    finally:
+        engine.close()
+
+
+def test_hung_requests_are_abandoned_without_stalling_the_rest():
+    bse = HangingBSE(size=30, hung=['500000'])
+    collected = []
+    engine = make_engine(bse.getQuote, collected, workers=2, spare_requests=2, timeout=0.2, retries=2)
+    try:
+        stats = engine.run(bse.getScripCodes())
+    finally:
+        bse.release()
+        engine.close()
+    assert stats['abandoned'] == 2
+    assert stats['failed'] == 1
+    assert stats['written'] == 29
+    assert '500000' not in {quote['scripCode'] for quote in collected}
+
+
+def test_saturated_request_pool_fails_fast():
+    bse = HangingBSE(size=2, hung=['500000'])
+    collected = []
+    engine = make_engine(bse.getQuote, collected, workers=1, spare_requests=0, timeout=0.2, retries=1)
+    try:
+        stats = engine.run(['500000', '500001'])
+    finally:
+        bse.release()
+        engine.close()
+    # The hung call holds the only request thread, so the next request is cancelled instead of queueing
+    assert stats['abandoned'] == 1
+    assert stats['saturated'] == 1
+    assert stats['failed'] == 2
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from model import keras_model, training_script
+from model.numpy_lstm import export_weights, load_numpy_model, max_difference, to_numpy_model
+
+TOLERANCE = 1e-5
+
+
+def random_windows(samples, input_shape, seed=1):
+    return np.random.default_rng(seed).random((samples,) + input_shape, dtype=np.float32)
+
+
+@pytest.mark.parametrize('build_model, input_shape', [
+    (training_script.build_model, (100, 5)),
+    (keras_model.build_model, (60, 6)),
+], ids=['lstm', 'bidirectional'])
+def test_numpy_engine_matches_keras(build_model, input_shape, tmp_path):
+    model = build_model(input_shape)
+    x = random_windows(16, input_shape)
+    # Building on a first batch creates the weights of models that declare no Input layer
+    model.predict(x[:1], verbose=0)
+
+    for samples in (1, 16):
+        assert max_difference(model, to_numpy_model(model), x[:samples]) < TOLERANCE
+
+    path = str(tmp_path / 'model.npz')
+    export_weights(model, path, tolerance=TOLERANCE)
+    assert max_difference(model, load_numpy_model(path), x) < TOLERANCE
@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from datasource.data_source import DataSource
+from utils.price_history import PriceHistoryStore
+
+
+def make_bars(start, days, close=100.0):
+    index = pd.date_range(start, periods=days, freq='D', name='Date')
+    closes = [close + offset for offset in range(days)]
+    return pd.DataFrame({'Open': closes, 'High': closes, 'Low': closes, 'Close': closes,
+                         'Volume': [1000.0] * days}, index=index)
+
+
+class FakeUpstream(DataSource):
+    """
+    In-memory upstream serving fixed frames and recording every requested range.
+    """
+
+    def __init__(self, frames):
+        super().__init__(chunk_size=50, retries=1, backoff=0.0)
+        self.frames = frames
+        self.requests = []
+
+    def _fetch_history_chunk(self, symbols, start, end):
+        self.requests.append((tuple(symbols), start, end))
+        histories = {}
+        for symbol in symbols:
+            frame = self.frames.get(symbol)
+            if frame is None:
+                continue
+            frame = frame[(frame.index >= pd.Timestamp(start)) & (frame.index < pd.Timestamp(end))]
+            if not frame.empty:
+                histories[symbol] = frame
+        return histories
+
+
+@pytest.fixture
+def store_factory(tmp_path):
+    def factory(upstream):
+        return PriceHistoryStore(db_path=str(tmp_path / 'history.db'), upstream=upstream)
+    return factory
+
+
+def test_missing_from_without_state_fetches_everything():
+    assert PriceHistoryStore._missing_from(None, None, date(2020, 1, 1), date(2020, 2, 1)) == date(2020, 1, 1)
+
+
+def test_missing_from_earlier_start_refetches_from_start():
+    state = ('2020-01-10', '2020-02-01')
+    assert PriceHistoryStore._missing_from(state, '2020-01-31', date(2020, 1, 1), date(2020, 2, 1)) == date(2020, 1, 1)
+
+
+def test_missing_from_complete_range_is_none():
+    state = ('2020-01-01', '2020-02-01')
+    assert PriceHistoryStore._missing_from(state, '2020-01-31', date(2020, 1, 1), date(2020, 1, 20)) is None
+    assert PriceHistoryStore._missing_from(state, '2020-01-31', date(2020, 1, 5), date(2020, 2, 1)) is None
+
+
+def test_missing_from_resumes_at_last_stored_bar():
+    state = ('2020-01-01', '2020-02-01')
+    # The last bar may have been partial when it was fetched, so it is requested again
+    assert PriceHistoryStore._missing_from(state, '2020-01-30', date(2020, 1, 1), date(2020, 3, 1)) == date(2020, 1, 30)
+    # Without any stored bar, the next fetch starts where the last one ended
+    assert PriceHistoryStore._missing_from(state, None, date(2020, 1, 1), date(2020, 3, 1)) == date(2020, 2, 1)
+
+
+def test_missing_from_refetches_today():
+    today = date.today()
+    state = ('2020-01-01', (today + timedelta(days=1)).isoformat())
+    assert PriceHistoryStore._missing_from(state, today.isoformat(), date(2020, 1, 1),
+                                           today + timedelta(days=1)) == today
+
+
+def test_get_history_fetches_only_the_missing_tail(store_factory):
+    upstream = FakeUpstream({'AAA.BO': make_bars('2020-01-01', 60)})
+    store = store_factory(upstream)
+
+    first = store.get_history('AAA.BO', '2020-01-01', '2020-02-01')
+    assert len(first) == 31
+    second = store.get_history('AAA.BO', '2020-01-01', '2020-03-01')
+    assert len(second) == 60
+    assert upstream.requests == [
+        (('AAA.BO',), '2020-01-01', '2020-02-01'),
+        (('AAA.BO',), '2020-01-31', '2020-03-01'),
+    ]
+    # A range that is already complete is served locally
+    store.get_history('AAA.BO', '2020-01-15', '2020-02-15')
+    assert len(upstream.requests) == 2
+
+
+def test_store_overwrites_partial_last_bar(store_factory):
+    bars = make_bars('2020-01-01', 10)
+    partial = bars.copy()
+    partial.loc[partial.index[-1], ['Close', 'Volume']] = [50.0, 10.0]
+    upstream = FakeUpstream({'AAA.BO': partial})
+    store = store_factory(upstream)
+    store.sync('AAA.BO', '2020-01-01', '2020-01-11')
+    assert store.read('AAA.BO', '2020-01-01', '2020-01-11')['Close'].iloc[-1] == 50.0
+
+    # The day closes and upstream now returns the final values for the same date
+    upstream.frames['AAA.BO'] = make_bars('2020-01-01', 12)
+    store.sync('AAA.BO', '2020-01-01', '2020-01-13')
+    history = store.read('AAA.BO', '2020-01-01', '2020-01-13')
+    assert len(history) == 12
+    assert history.loc['2020-01-10', 'Close'] == bars.loc['2020-01-10', 'Close']
+    assert history.loc['2020-01-10', 'Volume'] == 1000.0
+
+
+class FlakyUpstream(FakeUpstream):
+    """
+    Upstream whose first history request fails.
+    """
+
+    def __init__(self, frames):
+        super().__init__(frames)
+        self.failures = 1
+
+    def _fetch_history_chunk(self, symbols, start, end):
+        if self.failures:
+            self.failures -= 1
+            self.requests.append((tuple(symbols), start, end))
+            raise ConnectionError("upstream unavailable")
+        return super()._fetch_history_chunk(symbols, start, end)
+
+
+def test_failed_fetch_does_not_advance_sync(store_factory):
+    upstream = FlakyUpstream({'AAA.BO': make_bars('2020-01-01', 31), 'BBB.BO': make_bars('2020-01-01', 31)})
+    store = store_factory(upstream)
+
+    assert store.sync_many(['AAA.BO', 'BBB.BO'], '2020-01-01', '2020-02-01') == 0
+    assert store.read('AAA.BO', '2020-01-01', '2020-02-01') is None
+
+    # The range that failed is requested again in full, not resumed from the failed sync's end
+    assert store.sync_many(['AAA.BO', 'BBB.BO'], '2020-01-01', '2020-02-01') == 62
+    assert upstream.requests[-1] == (('AAA.BO', 'BBB.BO'), '2020-01-01', '2020-02-01')
+    assert len(store.read('AAA.BO', '2020-01-01', '2020-02-01')) == 31
+
+
+def test_fetch_history_reports_failed_symbols():
+    upstream = FlakyUpstream({'AAA.BO': make_bars('2020-01-01', 31)})
+    upstream.chunk_size = 1
+    failed = set()
+    frames = upstream.fetch_history(['AAA.BO', 'BBB.BO'], '2020-01-01', '2020-02-01', failed=failed)
+    assert failed == {'AAA.BO'}
+    assert list(frames) == []
@@ -0,0 +1,73 @@
+import pytest
+
+from executors import scheduler as scheduler_module
+from executors.scheduler import IncrementalScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, 'monotonic', clock)
+    return clock
+
+
+def make_scheduler(universes, batches):
+    universes = iter(universes)
+
+    def get_codes():
+        codes = next(universes)
+        if isinstance(codes, Exception):
+            raise codes
+        return codes
+
+    def process_batch(batch):
+        batches.append(list(batch))
+        return {code: False for code in batch}
+
+    return IncrementalScheduler(get_codes, process_batch, budget=30.0, min_interval=60.0, universe_refresh=0)
+
+
+def test_code_returning_to_the_universe_keeps_a_single_queue_entry(clock):
+    batches = []
+    scheduler = make_scheduler([{'A'}, {'A'}, {'A'}, set(), {'A'}] + [{'A'}] * 20, batches)
+    for _ in range(25):
+        scheduler.tick()
+        clock.now += 10.0
+        assert scheduler.queue_size == 1
+
+    assert batches
+    assert all(batch == ['A'] for batch in batches)
+
+
+def test_failed_universe_refresh_keeps_the_previous_universe(clock):
+    batches = []
+    scheduler = make_scheduler([{'A', 'B'}, RuntimeError('database is locked'), {'A', 'B'}], batches)
+    scheduler.tick()
+    # Unchanged codes back off to twice min_interval
+    clock.now += 120.0
+
+    stats = scheduler.tick()
+    assert stats['checked'] == 2
+    assert sorted(batches[-1]) == ['A', 'B']
+    assert scheduler.tick() is not None
+
+
+def test_tick_reports_symbols_per_second(clock):
+    batches = []
+    scheduler = make_scheduler([{'A', 'B'}], batches)
+
+    def slow_batch(batch):
+        clock.now += 4.0
+        return {code: True for code in batch}
+
+    scheduler.process_batch = slow_batch
+    stats = scheduler.tick()
+    assert stats['symbols_per_second'] == 0.5
@@ -1,34 +1,148 @@
+import os
 import sqlite3
-from queue import Queue
+from contextlib import contextmanager
+from queue import Empty, Queue
 from threading import Lock
 
+DB_PATH = os.environ.get('STOCK_SENSE_DB_PATH', 'utils/stock_predictions.db')
+
+
 class SQLiteConnectionPool:
-    def __init__(self, db_path, pool_size=5):
+    """
+    Bounded pool of SQLite connections shared by all threads of a process.
+
+    Connections are opened lazily up to pool_size and configured once when created. When all of
+    them are checked out, get_connection blocks until one is released or the timeout expires.
+    """
+
+    def __init__(self, db_path, pool_size=5, timeout=30.0):
         self._db_path = db_path
         self._pool_size = pool_size
+        self._timeout = timeout
         self._lock = Lock()
         self._pool = Queue(maxsize=self._pool_size)
-        self._initialize_pool()
+        self._created = 0
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.creates = 0
+        self.timeouts = 0
 
-    def _initialize_pool(self):
-        for _ in range(self._pool_size):
-            conn = sqlite3.connect(self._db_path)
-            self._pool.put(conn)
+    def _create_connection(self):
+        conn = sqlite3.connect(self._db_path, timeout=self._timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.execute(f'PRAGMA busy_timeout={int(self._timeout * 1000)}')
+        return conn
 
-    def get_connection(self):
-        with self._lock:
-            if self._pool.empty():
-                conn = sqlite3.connect(self._db_path)
+    def get_connection(self, timeout=None):
+        """
+        Check out a connection, waiting up to timeout seconds when the pool is exhausted.
+
+        Raises:
+            TimeoutError: If no connection became available in time.
+        """
+        timeout = self._timeout if timeout is None else timeout
+        try:
+            conn = self._pool.get_nowait()
+        except Empty:
+            with self._lock:
+                create = self._created < self._pool_size
+                if create:
+                    self._created += 1
+                    self.creates += 1
+                else:
+                    self.waits += 1
+            if create:
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
             else:
-                conn = self._pool.get()
-            return conn
+                try:
+                    conn = self._pool.get(timeout=timeout)
+                except Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise TimeoutError(f"No database connection available after {timeout}s")
+        with self._lock:
+            self.checkouts += 1
+        return conn
 
     def release_connection(self, conn):
+        """
+        Return a connection to the pool, rolling back anything left uncommitted.
+        """
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._pool.put(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that checks out a connection and always releases it back to the pool.
+        """
+        conn = self.get_connection(timeout)
+        try:
+            yield conn
+        finally:
+            self.release_connection(conn)
+
+    def stats(self):
+        """
+        Returns pool counters: connections created, checkouts, checkouts that had to wait, timeouts,
+        and how many connections are currently idle and in use.
+        """
         with self._lock:
-            self._pool.put(conn)
+            idle = self._pool.qsize()
+            return {
+                'size': self._pool_size,
+                'created': self._created,
+                'idle': idle,
+                'in_use': self._created - idle,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'creates': self.creates,
+                'timeouts': self.timeouts,
+            }
 
     def close_all_connections(self):
         with self._lock:
+            self._closed = True
             while not self._pool.empty():
                 conn = self._pool.get()
                 conn.close()
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_pool(db_path=DB_PATH, pool_size=10):
+    """
+    Returns the process-wide pool for db_path, creating it on first use.
+    """
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SQLiteConnectionPool(db_path, pool_size=pool_size)
+            _pools[key] = pool
+        return pool
+
+
+def pool_stats():
+    """
+    Returns {database path: stats()} for every pool of this process.
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {path: pool.stats() for path, pool in pools.items()}
@@ -0,0 +1,62 @@
+import logging
+
+from utils.connection_pool import DB_PATH, get_pool
+
+logger = logging.getLogger(__name__)
+
+
+def get_db_pool():
+    """
+    Returns the process-wide connection pool for the predictions database.
+    Use it as `with get_db_pool().connection() as conn:` so the connection is always released.
+    """
+    return get_pool(DB_PATH)
+
+
+def execute_query(query, args=(), fetchone=False, fetchall=False, commit=False):
+    """
+    Execute a SQL query on the database.
+
+    Parameters:
+        query (str): The SQL query to be executed.
+        args (tuple, optional): The arguments to be passed with the query. Defaults to ().
+        fetchone (bool, optional): Flag to fetch only one result. Defaults to False.
+        fetchall (bool, optional): Flag to fetch all results. Defaults to False.
+        commit (bool, optional): Flag to commit the transaction. Defaults to False.
+
+    Returns:
+        tuple or None: The result of the query execution.
+    """
+    with get_db_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(query, args)
+            if commit:
+                conn.commit()
+            if fetchone:
+                result = cursor.fetchone()
+            elif fetchall:
+                result = cursor.fetchall()
+            else:
+                result = None
+        except Exception as e:
+            logger.error(f"SQL error: {e}")
+            result = None
+    return result
+
+
+def check_index_existence(index_name, table_name):
+    """
+    Check if a specific index exists in the database.
+
+    :param table_name: The name of the table to check.
+    :param index_name: The name of the index to check.
+    :return: Boolean indicating if the index exists or not.
+    """
+    try:
+        query = f'PRAGMA index_list({table_name})'
+        indices = execute_query(query, fetchall=True)
+        return any(index['name'] == index_name for index in indices)
+    except Exception as e:
+        logger.error(f"Error checking index existence: {e}")
+        return False
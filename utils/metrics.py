@@ -0,0 +1,262 @@
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Latency buckets in seconds, from sub-millisecond DB calls up to full model training runs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Counter:
+    """
+    Monotonically increasing count per label combination.
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """
+    Cumulative latency histogram per label combination, with Prometheus _bucket/_sum/_count samples.
+    An observation costs one bisect and a few additions under a lock.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in values.items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + (('le', _format_value(bound)),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class CallbackGauge:
+    """
+    Gauge read at scrape time, for values that already live elsewhere such as queue depths and pool
+    counters. callback returns a number, or a dict of label value tuple -> number.
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=(), type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.type = type
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            if value is not None:
+                yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class MetricsRegistry:
+    """
+    Named metrics of this process, rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def gauge(self, name, documentation, callback, labelnames=(), type='gauge'):
+        """
+        Register (or replace) a gauge computed by callback at scrape time.
+        """
+        with self._lock:
+            self._metrics[name] = CallbackGauge(name, documentation, callback, labelnames, type)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+                continue
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    """
+    Returns the process-wide metrics registry.
+    """
+    return _registry
+
+
+STAGE_SECONDS = _registry.histogram('stock_sense_stage_seconds', 'Latency of pipeline stages.', ('stage',))
+STAGE_ERRORS = _registry.counter('stock_sense_stage_errors_total', 'Pipeline stage calls that raised.', ('stage',))
+
+
+class timed:
+    """
+    Record the latency of a stage in stock_sense_stage_seconds, and exceptions in
+    stock_sense_stage_errors_total. Use as a decorator, @timed('create_features'), or as a context
+    manager, `with timed('write'):`.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        STAGE_SECONDS.observe(time.perf_counter() - self._started, stage=self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def observe_stage(stage, seconds, failed=False):
+    """
+    Record a stage duration that was measured elsewhere.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if failed:
+        STAGE_ERRORS.inc(stage=stage)
+
+
+def register_pool_metrics():
+    """
+    Expose the connection counters of every SQLite pool of this process.
+    """
+    from utils.connection_pool import pool_stats
+
+    def by_pool(*keys):
+        return lambda: {(os.path.basename(path), key): stats[key]
+                        for path, stats in pool_stats().items() for key in keys}
+
+    _registry.gauge('stock_sense_db_pool_connections', 'Pooled SQLite connections by state.',
+                    by_pool('idle', 'in_use'), ('db', 'state'))
+    _registry.gauge('stock_sense_db_pool_events_total', 'Pool checkouts, waits for a free connection and timeouts.',
+                    by_pool('checkouts', 'waits', 'timeouts'), ('db', 'event'), type='counter')
+
+
+def instrument_app(app, service):
+    """
+    Time every request of a Flask app per endpoint and serve the registry, including the DB pool
+    counters, at /metrics.
+    """
+    from flask import Response, g, request
+
+    register_pool_metrics()
+
+    requests = _registry.histogram('stock_sense_http_request_seconds', 'Latency of HTTP requests.',
+                                   ('service', 'endpoint', 'method', 'status'))
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            requests.observe(time.perf_counter() - started, service=service,
+                             endpoint=request.endpoint or 'unmatched', method=request.method,
+                             status=response.status_code)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(_registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,108 @@
+import logging
+import os
+
+import numpy as np
+
+from utils.metrics import timed
+from utils.model_cache import get_model_cache
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+CLOSE_INDEX = FEATURE_COLUMNS.index('Close')
+PREDICTION_BATCH_SIZE = 256
+
+# 'numpy' serves the weights exported by model.numpy_lstm, 'keras' the saved Keras model itself
+INFERENCE_BACKEND = os.environ.get('STOCK_SENSE_INFERENCE_BACKEND', 'numpy')
+
+# model.training_script pulls in scikit-learn, and TensorFlow once a model is built or loaded, so it
+# is imported on first use; the read-only API only touches utils.db and never pays for it.
+
+
+def _weights_current(weights, model_file):
+    return os.path.exists(weights) and (not os.path.exists(model_file)
+                                        or os.path.getmtime(weights) >= os.path.getmtime(model_file))
+
+
+def load_prediction_model():
+    """
+    Returns the shared prediction model, training it first if no saved model exists yet.
+
+    With the numpy backend, the weights exported next to the Keras model are served, so prediction
+    does not load TensorFlow. Weights older than the model are exported again; if that fails the
+    Keras model is served instead.
+    """
+    from model.numpy_lstm import export_weights, weights_path
+    from model.training_script import MODEL_FILE, train_model
+
+    weights = weights_path(MODEL_FILE)
+    use_numpy = INFERENCE_BACKEND == 'numpy'
+    if not os.path.exists(MODEL_FILE) and not (use_numpy and os.path.exists(weights)):
+        logger.info(f"{MODEL_FILE} not found. Training model...")
+        train_model('AAPL')
+
+    # Served from the process-wide cache; only deserialized again when the file changes on disk
+    if use_numpy and _weights_current(weights, MODEL_FILE):
+        return get_model_cache().get(weights)
+    model = get_model_cache().get(MODEL_FILE)
+    if use_numpy:
+        try:
+            numpy_model = export_weights(model, weights)
+            get_model_cache().put(weights, numpy_model)
+            return numpy_model
+        except ValueError as e:
+            logger.warning(f"Serving {MODEL_FILE} with Keras, its weights could not be exported: {e}")
+    return model
+
+
+@timed('prepare_inference_window')
+def prepare_inference_window(stock):
+    """
+    Build the model input for the next-day prediction of one symbol.
+
+    Parameters:
+        stock (pandas.DataFrame): Price history as returned by download_stock_data.
+
+    Returns:
+        tuple: The last (time_step, features) window and the scaler fitted on the symbol's history.
+    """
+    from model.training_script import preprocess_data
+
+    data = stock[FEATURE_COLUMNS].dropna()
+    X, _, scaler = preprocess_data(data, last_only=True)
+    return X[0], scaler
+
+
+@timed('predict_batch')
+def predict_batch(windows, scalers, batch_size=PREDICTION_BATCH_SIZE):
+    """
+    Predict the next closing price for many symbols with one model call per chunk.
+
+    Parameters:
+        windows (list): Input windows as returned by prepare_inference_window.
+        scalers (list): The matching scalers, used to map predictions back to prices.
+        batch_size (int): Maximum number of windows stacked into a single predict call.
+
+    Returns:
+        list: Predicted closing prices in the same order as windows.
+    """
+    model = load_prediction_model()
+    predictions = []
+    for start in range(0, len(windows), batch_size):
+        chunk = np.stack(windows[start:start + batch_size])
+        scaled = model.predict(chunk, batch_size=len(chunk), verbose=0)[:, 0]
+        for value, scaler in zip(scaled, scalers[start:start + batch_size]):
+            # Undo the MinMax scaling of the 'Close' column only
+            predictions.append(float((value - scaler.min_[CLOSE_INDEX]) / scaler.scale_[CLOSE_INDEX]))
+    return predictions
+
+
+@timed('predict_algo')
+def predict_algo(stock, symbol):
+    try:
+        window, scaler = prepare_inference_window(stock)
+        # Predict the next day's closing price
+        return predict_batch([window], [scaler])[0]
+    except Exception as e:
+        logger.error(f"Error predicting for {symbol}: {e}")
+        return None
@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _load_model(path):
+    # Weights exported for the NumPy engine load without TensorFlow
+    if path.endswith('.npz'):
+        from model.numpy_lstm import load_numpy_model
+        return load_numpy_model(path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+
+class ModelCache:
+    """
+    Thread-safe LRU cache of deserialized models.
+
+    Entries are keyed by the model path together with the file's mtime and size, so a model
+    file rewritten on disk (e.g. by training_script.train_model) is picked up on the next
+    lookup without restarting the process.
+    """
+
+    def __init__(self, max_size=8, loader=_load_model):
+        self._max_size = max_size
+        self._loader = loader
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _file_key(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path):
+        """
+        Return the model stored at path, loading it only when it is not cached or the file changed.
+
+        Parameters:
+            path (str): Path of the saved model file.
+
+        Returns:
+            The loaded model object.
+        """
+        path = os.path.abspath(path)
+        file_key = self._file_key(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == file_key:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        # Only one thread deserializes a given file; the others wait and reuse its result.
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry[0] == file_key:
+                    self._entries.move_to_end(path)
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+
+            logger.info(f"Loading model from {path}")
+            model = self._loader(path)
+            self.put(path, model, file_key)
+            return model
+
+    def put(self, path, model, file_key=None):
+        """
+        Store an already loaded model, e.g. one that has just been trained and saved.
+        """
+        path = os.path.abspath(path)
+        if file_key is None:
+            file_key = self._file_key(path)
+        with self._lock:
+            self._entries[path] = (file_key, model)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self._max_size:
+                evicted_path, _ = self._entries.popitem(last=False)
+                logger.info(f"Evicted model {evicted_path} from cache")
+
+    def invalidate(self, path=None):
+        """
+        Drop one cached model, or every cached model when path is None.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_model_cache = ModelCache()
+
+
+def get_model_cache():
+    """
+    Returns the process-wide model cache shared by all threads.
+    """
+    return _model_cache
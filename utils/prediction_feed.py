@@ -0,0 +1,109 @@
+import logging
+import threading
+
+from flask_socketio import emit, join_room
+
+from dataclass_db.dataclass_db_executor import fetch_predictions_page
+from utils.response_cache import table_version
+from utils.db import get_db_pool
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionFeed:
+    """
+    Pushes prediction changes of one table to subscribed Socket.IO clients.
+
+    Every write to the table, from the scheduler, the executors or any other process, is recorded by
+    the create_db triggers in prediction_changes. A single background task per server checks for
+    entries newer than the last version it saw once per interval. When there are any, it re-reads
+    the top snapshot_size rows and broadcasts how they differ from the previous top as one
+    'predictions' message, so a burst of writes reaches clients as one delta per interval and the
+    database is polled once per server rather than once per dashboard.
+
+    Clients emit 'subscribe' and receive a 'snapshot' of the top rows, then deltas of the form
+    {"rows": [...], "removed": [security_id, ...], "version": int}: rows that entered the top or
+    changed within it, and the security IDs that left it. Applying them keeps a client's rows equal
+    to the top of /get_predictions; changes below the top are not sent.
+
+    Parameters:
+        socketio (flask_socketio.SocketIO): Server the feed broadcasts on.
+        table (str): 'predictions_linear' or 'predictions'.
+        interval (float): Seconds between polls; also the coalescing window.
+        snapshot_size (int): Rows sent to a client when it subscribes.
+    """
+
+    def __init__(self, socketio, table, interval=1.0, snapshot_size=100):
+        self.socketio = socketio
+        self.table = table
+        self.room = f'{table}_updates'
+        self.interval = interval
+        self.snapshot_size = snapshot_size
+        self.version = None
+        self.top = {}
+        self.messages_sent = 0
+        self._lock = threading.Lock()
+        self._task = None
+
+    def subscribe(self):
+        """
+        Socket.IO event handler body: join the update room and send the current snapshot.
+        """
+        self.start()
+        join_room(self.room)
+        emit('snapshot', {
+            'rows': fetch_predictions_page(self.table, self.snapshot_size),
+            'version': self.version,
+        })
+
+    def start(self):
+        """
+        Start the polling task unless it is already running.
+        """
+        with self._lock:
+            if self._task is None:
+                with get_db_pool().connection() as conn:
+                    # Only changes made from now on are pushed; subscribers get the rest as a snapshot
+                    self.version = table_version(conn, self.table) or 0
+                self.top = self._read_top()
+                self._task = self.socketio.start_background_task(self._run)
+
+    def poll(self):
+        """
+        Collect the changes since the last poll.
+
+        Returns:
+            dict or None: The delta message, or None when nothing changed.
+        """
+        with get_db_pool().connection() as conn:
+            changes = conn.execute('''
+                SELECT security_id, version FROM prediction_changes
+                WHERE table_name = ? AND version > ?
+            ''', (self.table, self.version)).fetchall()
+        if not changes:
+            return None
+
+        self.version = max(change['version'] for change in changes)
+        changed = {change['security_id'] for change in changes}
+        top = self._read_top()
+        rows = [row for security_id, row in top.items() if security_id in changed or security_id not in self.top]
+        removed = [security_id for security_id in self.top if security_id not in top]
+        self.top = top
+        if not rows and not removed:
+            return None
+        return {'rows': rows, 'removed': removed, 'version': self.version}
+
+    def _read_top(self):
+        return {row['security_id']: row for row in fetch_predictions_page(self.table, self.snapshot_size)}
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                delta = self.poll()
+            except Exception as e:
+                logger.error(f"Prediction feed for {self.table} failed to poll: {e}")
+                continue
+            if delta is not None:
+                self.socketio.emit('predictions', delta, to=self.room)
+                self.messages_sent += 1
@@ -0,0 +1,104 @@
+import base64
+import json
+
+from flask import Response, jsonify, request
+
+from dataclass_db.dataclass_db_executor import fetch_predictions_page, iter_predictions
+from utils.response_cache import get_response_cache, table_version
+from utils.db import get_db_pool
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(row):
+    """
+    Opaque cursor pointing after row in a profit-ordered listing.
+    """
+    key = json.dumps([row['profit'], row['security_id']])
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor.
+
+    Returns:
+        tuple: (profit, security_id)
+
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor.
+    """
+    try:
+        profit, security_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(profit), str(security_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _listing_args():
+    limit = request.args.get('limit', type=int)
+    min_profit = request.args.get('min_profit', type=float)
+    cursor = request.args.get('cursor')
+    if 'limit' in request.args and (limit is None or limit < 1):
+        raise ValueError("limit must be a positive integer")
+    if 'min_profit' in request.args and min_profit is None:
+        raise ValueError("min_profit must be a number")
+    after = decode_cursor(cursor) if cursor else None
+    return limit, min_profit, after
+
+
+def prediction_listing(table):
+    """
+    Response of a /get_predictions endpoint.
+
+    Query parameters:
+        limit (int, optional): Page size, capped at MAX_PAGE_SIZE.
+        min_profit (float, optional): Only stocks with at least this profit.
+        cursor (str, optional): next_cursor of the previous page.
+
+    Returns:
+        Flask response: Without limit or cursor, the JSON array of every listed stock; otherwise
+        {"items": [...], "next_cursor": str or null}. Both are served from the response cache.
+    """
+    try:
+        limit, min_profit, after = _listing_args()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    with get_db_pool().connection() as conn:
+        version = table_version(conn, table)
+
+    if limit is None and after is None:
+        def build():
+            return fetch_predictions_page(table, min_profit=min_profit)
+    else:
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+
+        def build():
+            # One extra row tells whether another page follows
+            rows = fetch_predictions_page(table, limit + 1, min_profit, after)
+            next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+            return {'items': rows[:limit], 'next_cursor': next_cursor}
+
+    key = (table, limit, min_profit, after)
+    return get_response_cache().response(key, version, build)
+
+
+def prediction_export(table):
+    """
+    Every listed stock of table as one JSON array, streamed page by page so the full list is never
+    held in memory. Accepts the same min_profit parameter as prediction_listing.
+    """
+    try:
+        _, min_profit, _ = _listing_args()
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    def generate():
+        yield '['
+        for i, row in enumerate(iter_predictions(table, min_profit)):
+            yield (',' if i else '') + json.dumps(row, sort_keys=True)
+        yield ']'
+
+    return Response(generate(), mimetype='application/json')
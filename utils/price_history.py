@@ -0,0 +1,253 @@
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+from datasource.data_source import get_data_source
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = 'utils/price_history.db'
+
+# DataFrame column -> price_history column
+PRICE_COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Adj Close': 'adj_close',
+    'Volume': 'volume',
+}
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class PriceHistoryStore:
+    """
+    Persistent daily OHLCV history keyed by (symbol, date).
+
+    Requests are served from the local SQLite file; only the trailing days that have not been
+    fetched yet are requested from the upstream DataSource (the process-wide one by default),
+    in bulk for all symbols that need the same range.
+    """
+
+    def __init__(self, db_path=HISTORY_DB_PATH, upstream=None):
+        self._db_path = db_path
+        self._upstream = upstream
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_history (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    adj_close REAL,
+                    volume REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID
+            ''')
+            # Range already requested from upstream per symbol, so holidays are not re-fetched
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS price_history_sync (
+                    symbol TEXT PRIMARY KEY,
+                    start TEXT NOT NULL,
+                    fetched_until TEXT NOT NULL
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_history(self, symbol, start, end):
+        """
+        Return daily bars for symbol in [start, end), fetching only what is missing locally.
+
+        Parameters:
+            symbol (str): The ticker, e.g. 'RELIANCE.BO'.
+            start (str): First date, 'YYYY-MM-DD'.
+            end (str): Exclusive end date, 'YYYY-MM-DD'.
+
+        Returns:
+            pandas.DataFrame: Bars indexed by Date, or None when no data is available.
+        """
+        self.sync(symbol, start, end)
+        return self.read(symbol, start, end)
+
+    def sync(self, symbol, start, end):
+        """
+        Bring the local copy of symbol up to date for [start, end) and return the rows written.
+        """
+        return self.sync_many([symbol], start, end)
+
+    def sync_many(self, symbols, start, end):
+        """
+        Bring the local copies of many symbols up to date for [start, end).
+
+        Symbols that need the same missing range are fetched from upstream in one bulk request. Symbols
+        whose request still failed after the upstream's retries keep their previous sync state, so the
+        range is requested again on the next sync.
+
+        Returns:
+            int: Number of bars written.
+        """
+        start, end = _to_date(start), _to_date(end)
+        states = {}
+        groups = {}
+        with self._lock:
+            conn = self._connect()
+            try:
+                for symbol in symbols:
+                    state = conn.execute(
+                        'SELECT start, fetched_until FROM price_history_sync WHERE symbol = ?', (symbol,)
+                    ).fetchone()
+                    last_bar = conn.execute(
+                        'SELECT MAX(date) FROM price_history WHERE symbol = ?', (symbol,)
+                    ).fetchone()[0]
+                    fetch_start = self._missing_from(state, last_bar, start, end)
+                    if fetch_start is not None:
+                        states[symbol] = state
+                        groups.setdefault(fetch_start, []).append(symbol)
+            finally:
+                conn.close()
+
+        upstream = self._upstream or get_data_source()
+        written = 0
+        failed = set()
+        for fetch_start, group in groups.items():
+            frames = upstream.fetch_history(group, fetch_start.isoformat(), end.isoformat(), failed=failed)
+            for symbol in group:
+                written += self._store(symbol, frames.get(symbol))
+            logger.info(f"Fetched {len(frames)}/{len(group)} symbols for {fetch_start} -> {end}")
+        if failed:
+            logger.warning(f"History of {len(failed)} symbols could not be fetched, they are retried on the next sync")
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = []
+                for symbol, state in states.items():
+                    # Only ranges upstream actually answered are marked as fetched
+                    if symbol in failed:
+                        continue
+                    new_start = start if state is None else min(start, _to_date(state[0]))
+                    new_until = end if state is None else max(end, _to_date(state[1]))
+                    rows.append((symbol, new_start.isoformat(), new_until.isoformat()))
+                conn.executemany('''
+                    INSERT INTO price_history_sync (symbol, start, fetched_until) VALUES (?, ?, ?)
+                    ON CONFLICT(symbol) DO UPDATE SET start=excluded.start, fetched_until=excluded.fetched_until
+                ''', rows)
+                conn.commit()
+            finally:
+                conn.close()
+        return written
+
+    @staticmethod
+    def _missing_from(state, last_bar, start, end):
+        """
+        First date that has to be requested from upstream, or None when the local copy is complete.
+        """
+        if state is None or _to_date(state[0]) > start:
+            return start
+        fetched_until = _to_date(state[1])
+        # Bars dated today may still be moving, so they are always requested again
+        fresh_until = min(fetched_until, date.today())
+        if end <= fresh_until:
+            return None
+        if last_bar is not None:
+            return min(fresh_until, _to_date(last_bar))
+        return fresh_until
+
+    def _store(self, symbol, frame):
+        if frame is None or frame.empty:
+            return 0
+        if isinstance(frame.columns, pd.MultiIndex):
+            # Newer yfinance versions return (Price, Ticker) columns even for a single symbol
+            frame = frame.droplevel(-1, axis=1)
+
+        columns = [column for column in PRICE_COLUMNS if column in frame.columns]
+        rows = [
+            (symbol, pd.Timestamp(index).strftime('%Y-%m-%d'),
+             *(None if pd.isna(value) else float(value) for value in values))
+            for index, values in zip(frame.index, frame[columns].itertuples(index=False, name=None))
+        ]
+        names = ', '.join(PRICE_COLUMNS[column] for column in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f'{PRICE_COLUMNS[column]}=excluded.{PRICE_COLUMNS[column]}' for column in columns)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.executemany(f'''
+                    INSERT INTO price_history (symbol, date, {names}) VALUES (?, ?, {placeholders})
+                    ON CONFLICT(symbol, date) DO UPDATE SET {updates}
+                ''', rows)
+                conn.commit()
+            finally:
+                conn.close()
+        return len(rows)
+
+    def read(self, symbol, start, end):
+        """
+        Read bars for symbol in [start, end) from the local store only.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT date, open, high, low, close, adj_close, volume FROM price_history
+                WHERE symbol = ? AND date >= ? AND date < ?
+                ORDER BY date
+            ''', (symbol, _to_date(start).isoformat(), _to_date(end).isoformat())).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+
+        frame = pd.DataFrame(rows, columns=['Date'] + list(PRICE_COLUMNS))
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        frame = frame.set_index('Date')
+        if frame['Adj Close'].isna().all():
+            frame = frame.drop(columns='Adj Close')
+        return frame
+
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """
+    Returns the process-wide price history store, creating it on first use.
+    """
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = PriceHistoryStore()
+        return _history_store
+
+
+def set_history_store(store):
+    """
+    Replace the process-wide store, e.g. with one backed by an offline upstream.
+    """
+    global _history_store
+    with _history_store_lock:
+        _history_store = store
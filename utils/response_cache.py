@@ -0,0 +1,101 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+
+from flask import Response, json, request
+
+from utils.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+
+def table_version(conn, table_name):
+    """
+    Current write version of a table, bumped by the triggers create_db installs on it.
+
+    Returns:
+        int or None: The version, or None when the database predates the version counters.
+    """
+    try:
+        row = conn.execute('SELECT version FROM table_versions WHERE table_name = ?', (table_name,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else 0
+
+
+class ResponseCache:
+    """
+    Serialized JSON responses keyed by request and by the version of the table they were read from.
+
+    An entry is only served while its version matches the table's current version, so every write
+    to the table invalidates it without any explicit purge. Each entry carries an ETag derived from
+    its body, which lets clients revalidate with If-None-Match and get a 304 instead of the payload.
+
+    Parameters:
+        max_entries (int): Entries kept before the oldest is dropped.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, build):
+        """
+        Return (etag, body) for key at version, calling build() for the payload on a miss.
+        A version of None bypasses the cache.
+        """
+        if version is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self.hits += 1
+                    return entry[1], entry[2]
+
+        body = json.dumps(build())
+        etag = hashlib.sha1(body.encode()).hexdigest()
+        with self._lock:
+            self.misses += 1
+            if version is not None:
+                if key not in self._entries and len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (version, etag, body)
+        return etag, body
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def response(self, key, version, build):
+        """
+        Flask response for key: 304 when the client's If-None-Match matches, the cached JSON otherwise.
+        """
+        etag, body = self.get(key, version, build)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Clients must revalidate on every poll, which is a cheap 304 while nothing was written
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+get_metrics_registry().gauge('stock_sense_response_cache_lookups_total', 'Response cache lookups by result.',
+                             lambda: {('hit',): get_response_cache().hits, ('miss',): get_response_cache().misses},
+                             ('result',), type='counter')